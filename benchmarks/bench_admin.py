@@ -0,0 +1,269 @@
+
+"""
+    Benchmarks for the admin's request paths, against a generated
+    SQLite database standing in for the real one.
+
+    Builds a `SecureAdminBlueprint` app over `--models` tables of
+    `--rows` rows each, then times blueprint registration, logging in,
+    the index redirect, list/details/edit pages for a superuser and for
+    a restricted user, and rendering the menu. With `--relationships`,
+    each model also shows the user who owns each row and their roles,
+    and how many queries the list page takes is counted. Results are
+    written as JSON, so they can be compared between runs:
+
+        python benchmarks/bench_admin.py --models 30 --rows 10000 \\
+            --output bench_output.txt
+"""
+
+import argparse, json, os, platform, sqlite3, statistics, sys, tempfile, time
+from contextlib import redirect_stdout
+
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('SECURITY_PASSWORD_SALT', 'benchmark')
+
+from flask import Flask, render_template_string
+from flask_login import login_user
+from sqlalchemy import event
+from sqlsoup import SQLSoup
+
+from flask_secure_admin import SecureAdminBlueprint
+from flask_secure_admin.bootstrap import bootstrap_schema
+from flask_secure_admin.utils import encrypt_password
+
+RESTRICTED_ROLE = 'operator'
+PASSWORD = 'password'
+# How many users own the rows, with `--relationships`
+OWNERS = 100
+# Renders the menu the way master.html does
+MENU_TEMPLATE = ("{% import 'admin/layout.html' as layout with context %}"
+                 "{% if secure_admin_cached_menu is defined %}"
+                 "{{ secure_admin_cached_menu(layout.menu, admin_view) }}"
+                 "{% else %}{{ layout.menu() }}{% endif %}")
+
+
+def create_database(path, models, rows):
+    connection = sqlite3.connect(path)
+    for model in range(models):
+        connection.execute(
+            f'CREATE TABLE model_{model} (id INTEGER PRIMARY KEY, '
+            'name VARCHAR(80) NOT NULL, secret TEXT, body TEXT, '
+            'owner_id INTEGER REFERENCES users(id))')
+        connection.executemany(
+            f'INSERT INTO model_{model} (name, secret, body) VALUES (?, ?, ?)',
+            ((f'row {i}', f'secret {i}', 'x' * 500) for i in range(rows)))
+    connection.commit()
+    connection.close()
+
+
+def build_app(path, models, blueprint_options, relationships=False):
+    """ Returns the app, its blueprint, and how long registering took. """
+    app = Flask('benchmark')
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.db = SQLSoup(f'sqlite:///{path}')
+    view_options = dict(
+        can_view_details=True,
+        role_only_columns=dict(superuser=['secret']),
+        roles_accepted=['superuser', RESTRICTED_ROLE],
+    )
+    if relationships:
+        bootstrap_schema(app.db.bind)
+        for model in range(models):
+            getattr(app.db, f'model_{model}').relate('owner', app.db.users)
+        view_options.update(
+            column_list=['name', 'body', 'owner', 'owner.roles'],
+            column_formatters={
+                'owner': lambda v, c, m, p: m.owner.email,
+                'owner.roles': lambda v, c, m, p: ', '.join(
+                    role.name for role in m.owner.roles)})
+    blueprint = SecureAdminBlueprint(
+        name='Benchmark',
+        models=[f'model_{model}' for model in range(models)],
+        view_options=[dict(view_options) for _ in range(models)],
+        **blueprint_options)
+    # Keep bootstrapping messages out of the JSON on stdout
+    with redirect_stdout(sys.stderr):
+        started = time.perf_counter()
+        app.register_blueprint(blueprint)
+        elapsed = time.perf_counter() - started
+    return app, blueprint, elapsed
+
+
+def create_restricted_user(app):
+    with app.app_context():
+        if app.db.users.filter_by(email='operator@example.com').count():
+            return
+        user = app.db.users.insert(
+            email='operator@example.com', active=True,
+            password=encrypt_password(PASSWORD))
+        role = app.db.roles.insert(name=RESTRICTED_ROLE)
+        app.db.commit()
+        app.db.users_roles.insert(user_id=user.id, role_id=role.id)
+        app.db.commit()
+
+
+def create_owners(app, models, owners=OWNERS):
+    """ Users to own the rows of each model, in turn. """
+    with app.app_context():
+        if app.db.users.filter_by(email='owner0@example.com').count():
+            return
+        for owner in range(owners):
+            app.db.users.insert(
+                email=f'owner{owner}@example.com', active=False)
+        app.db.flush()
+        for model in range(models):
+            app.db.execute(
+                f'UPDATE model_{model} SET owner_id = '
+                f'(SELECT id FROM users WHERE email = '
+                f"'owner' || (model_{model}.id % {owners}) || '@example.com')")
+        app.db.commit()
+
+
+def logged_in_client(app, email):
+    client = app.test_client()
+    response = client.post('/login', data=dict(email=email, password=PASSWORD))
+    assert response.status_code == 302, f'Could not log in as {email}'
+    return client
+
+
+def timed(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return dict(
+        n=iterations,
+        min_ms=timings[0],
+        median_ms=statistics.median(timings),
+        p95_ms=timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        mean_ms=statistics.mean(timings),
+    )
+
+
+def get(client, url, status=200):
+    def fn():
+        response = client.get(url)
+        assert response.status_code == status, \
+            f'{url} returned {response.status_code}'
+    return fn
+
+
+def count_queries(app, client, url):
+    """ How many queries requesting `url` takes. """
+    client.get(url)
+    queries = []
+
+    def count(*args):
+        queries.append(args)
+    event.listen(app.db.bind, 'before_cursor_execute', count)
+    try:
+        get(client, url)()
+    finally:
+        event.remove(app.db.bind, 'before_cursor_execute', count)
+    return len(queries)
+
+
+def render_menu(app, blueprint, email):
+    view = blueprint.admin._views[1]
+    datastore = blueprint.security.datastore
+
+    def fn():
+        with app.test_request_context(f'{view.url}/'):
+            # As the user loader would, at the start of a request
+            login_user(datastore.find_user(email=email))
+            render_template_string(MENU_TEMPLATE, admin_view=view)
+    return fn
+
+
+def run(options):
+    results = {}
+    directory = tempfile.mkdtemp(prefix='secure-admin-bench-')
+    path = os.path.join(directory, 'benchmark.db')
+    create_database(path, options.models, options.rows)
+
+    blueprint_options = {}
+    if options.hash_rounds:
+        blueprint_options['password_hash_rounds'] = options.hash_rounds
+    if options.menu_cache_size:
+        blueprint_options['menu_cache_size'] = options.menu_cache_size
+
+    startup = []
+    for _ in range(options.startup_runs):
+        app, blueprint, seconds = build_app(
+            path, options.models, blueprint_options, options.relationships)
+        startup.append(seconds)
+    results['startup'] = dict(
+        n=len(startup), min_ms=min(startup) * 1000,
+        median_ms=statistics.median(startup) * 1000,
+        mean_ms=statistics.mean(startup) * 1000)
+
+    create_restricted_user(app)
+    if options.relationships:
+        create_owners(app, options.models)
+    users = dict(superuser='admin@example.com',
+                 restricted='operator@example.com')
+
+    results['login'] = timed(
+        lambda: logged_in_client(app, users['superuser']),
+        options.login_iterations)
+
+    superuser = logged_in_client(app, users['superuser'])
+    results['index_redirect'] = timed(
+        get(superuser, '/admin/', status=302), options.iterations)
+
+    view_url = blueprint.admin._views[1].url
+    for label, email in users.items():
+        client = logged_in_client(app, email)
+        for page, url in (('list', f'{view_url}/'),
+                          ('list_deep_page', f'{view_url}/?page=50'),
+                          ('details', f'{view_url}/details/?id=1'),
+                          ('edit', f'{view_url}/edit/?id=1')):
+            results[f'{page}.{label}'] = timed(
+                get(client, url), options.iterations)
+        if options.relationships:
+            results[f'list_queries.{label}'] = count_queries(
+                app, client, f'{view_url}/?page_size=100')
+        results[f'menu.{label}'] = timed(
+            render_menu(app, blueprint, email), options.iterations)
+
+    return dict(
+        config=dict(models=options.models, rows=options.rows,
+                    iterations=options.iterations,
+                    hash_rounds=options.hash_rounds,
+                    menu_cache_size=options.menu_cache_size,
+                    relationships=options.relationships),
+        environment=dict(python=platform.python_version(),
+                         platform=platform.platform()),
+        results=results,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--models', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--login-iterations', type=int, default=10)
+    parser.add_argument('--startup-runs', type=int, default=3)
+    parser.add_argument('--hash-rounds', type=int, default=None,
+                        help='password hashing rounds, to speed up logins')
+    parser.add_argument('--menu-cache-size', type=int, default=None,
+                        help='cache rendered menus, to compare with rendering')
+    parser.add_argument('--relationships', action='store_true',
+                        help='show the owner of each row, and their roles, '
+                             'in the list views')
+    parser.add_argument('--output', default=None,
+                        help='file to write JSON results to (default stdout)')
+    options = parser.parse_args(argv)
+
+    report = json.dumps(run(options), indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+
+"""
+    Compares the admin's model backends, against the same generated
+    SQLite database: the default `SQLSoupBackend`, which reflects every
+    table on startup and patches Flask-Security's mixins onto users as
+    they're loaded, and a `DeclarativeBackend` over prebuilt models.
+
+    Times blueprint registration, logging in, loading the logged in
+    user (as Flask-Login does at the start of every request), and the
+    list & details pages, for each backend. Results are written as
+    JSON, so they can be compared between runs:
+
+        python benchmarks/bench_backends.py --models 30 --rows 10000 \\
+            --output bench_backends_output.txt
+"""
+
+import argparse, json, os, platform, statistics, sys, tempfile, time
+from contextlib import redirect_stdout
+
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('SECURITY_PASSWORD_SALT', 'benchmark')
+
+from flask import Flask
+from flask_security import RoleMixin
+from sqlalchemy import (Table, Column, Integer, String, Text, Boolean,
+                        DateTime, ForeignKey, create_engine)
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship, scoped_session, sessionmaker
+from sqlsoup import SQLSoup
+
+from flask_secure_admin import (SecureAdminBlueprint, SQLSoupBackend,
+                                DeclarativeBackend, RoleNamesUserMixin)
+from bench_admin import create_database, logged_in_client, timed, get
+
+BACKENDS = ('sqlsoup', 'declarative')
+
+
+def declarative_models(models):
+    """ The users & roles models, and one per generated table,
+        as an application would define them up front. """
+    Base = declarative_base()
+    users_roles = Table(
+        'users_roles', Base.metadata,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+        Column('role_id', Integer, ForeignKey('roles.id'), nullable=False))
+
+    class Role(Base, RoleMixin):
+        __tablename__ = 'roles'
+        id = Column(Integer, primary_key=True)
+        name = Column(String(80), nullable=False, unique=True)
+        description = Column(String(255))
+
+    class User(Base, RoleNamesUserMixin):
+        __tablename__ = 'users'
+        id = Column(Integer, primary_key=True)
+        email = Column(String(255), nullable=False, unique=True)
+        password = Column(String(255))
+        active = Column(Boolean)
+        confirmed_at = Column(DateTime)
+        roles = relationship(Role, secondary=users_roles)
+
+    tables = [type(f'Model{model}', (Base,), dict(
+        __tablename__=f'model_{model}',
+        id=Column(Integer, primary_key=True),
+        name=Column(String(80), nullable=False),
+        secret=Column(Text),
+        body=Column(Text),
+    )) for model in range(models)]
+    return User, Role, tables
+
+
+def build_app(path, models, backend, declarative, blueprint_options):
+    """ Returns the app, its blueprint, and how long registering took
+        (including creating the backend, which is where SQLSoup
+        starts out). """
+    app = Flask('benchmark')
+    app.config['WTF_CSRF_ENABLED'] = False
+    started = time.perf_counter()
+    if backend == 'sqlsoup':
+        model_backend = SQLSoupBackend(SQLSoup(f'sqlite:///{path}'))
+    else:
+        user_model, role_model, tables = declarative
+        session = scoped_session(sessionmaker(
+            bind=create_engine(f'sqlite:///{path}')))
+        model_backend = DeclarativeBackend(
+            user_model, role_model, tables, session=session)
+    blueprint = SecureAdminBlueprint(
+        name='Benchmark',
+        models=[f'model_{model}' for model in range(models)],
+        view_options=[dict(
+            can_view_details=True,
+            role_only_columns=dict(superuser=['secret']),
+        ) for _ in range(models)],
+        model_backend=model_backend,
+        **blueprint_options)
+    # Keep bootstrapping messages out of the JSON on stdout
+    with redirect_stdout(sys.stderr):
+        app.register_blueprint(blueprint)
+    return app, blueprint, time.perf_counter() - started
+
+
+def load_user(app, blueprint):
+    datastore = blueprint.security.datastore
+
+    def fn():
+        with app.test_request_context('/admin/'):
+            user = datastore.find_user(id=1)
+            assert user.has_role('superuser')
+    return fn
+
+
+def bench_backend(path, options, backend, declarative, blueprint_options):
+    results = {}
+    startup = []
+    for _ in range(options.startup_runs):
+        app, blueprint, seconds = build_app(
+            path, options.models, backend, declarative, blueprint_options)
+        startup.append(seconds)
+    results['startup'] = dict(
+        n=len(startup), min_ms=min(startup) * 1000,
+        median_ms=statistics.median(startup) * 1000,
+        mean_ms=statistics.mean(startup) * 1000)
+
+    results['login'] = timed(
+        lambda: logged_in_client(app, 'admin@example.com'),
+        options.login_iterations)
+    results['load_user'] = timed(load_user(app, blueprint),
+                                 options.iterations)
+
+    client = logged_in_client(app, 'admin@example.com')
+    view_url = blueprint.admin._views[1].url
+    for page, url in (('list', f'{view_url}/'),
+                      ('details', f'{view_url}/details/?id=1'),
+                      ('users_list', '/admin/users/')):
+        results[page] = timed(get(client, url), options.iterations)
+    return results
+
+
+def run(options):
+    directory = tempfile.mkdtemp(prefix='secure-admin-bench-')
+    path = os.path.join(directory, 'benchmark.db')
+    create_database(path, options.models, options.rows)
+
+    blueprint_options = {}
+    if options.hash_rounds:
+        blueprint_options['password_hash_rounds'] = options.hash_rounds
+    if options.user_cache_size:
+        blueprint_options['user_cache_size'] = options.user_cache_size
+
+    # Defining the models is part of importing the application,
+    # so it happens once per process, outside of the timings
+    started = time.perf_counter()
+    declarative = declarative_models(options.models)
+    define_ms = (time.perf_counter() - started) * 1000
+
+    results = {backend: bench_backend(path, options, backend, declarative,
+                                      blueprint_options)
+               for backend in BACKENDS}
+    results['declarative']['define_models'] = dict(n=1, min_ms=define_ms)
+
+    return dict(
+        config=dict(models=options.models, rows=options.rows,
+                    iterations=options.iterations,
+                    hash_rounds=options.hash_rounds,
+                    user_cache_size=options.user_cache_size),
+        environment=dict(python=platform.python_version(),
+                         platform=platform.platform()),
+        results=results,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--models', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--login-iterations', type=int, default=10)
+    parser.add_argument('--startup-runs', type=int, default=3)
+    parser.add_argument('--hash-rounds', type=int, default=None,
+                        help='password hashing rounds, to speed up logins')
+    parser.add_argument('--user-cache-size', type=int, default=None,
+                        help='cache loaded users, as with the blueprint')
+    parser.add_argument('--output', default=None,
+                        help='file to write JSON results to (default stdout)')
+    options = parser.parse_args(argv)
+
+    report = json.dumps(run(options), indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
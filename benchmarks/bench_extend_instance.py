@@ -0,0 +1,45 @@
+"""
+    Micro-benchmark for `_extend_instance`, which runs on the user
+    loaded by `SQLSoupUserDataStore` on every authenticated request.
+
+    Compares making a fresh mixin class per call (how it used to work)
+    against the cached derived class. Run with:
+
+        python benchmarks/bench_extend_instance.py
+"""
+
+import timeit
+
+from flask_security import UserMixin
+from sqlsoup import SQLSoup
+
+from flask_secure_admin.contrib.sqlsoup.utils import _extend_instance
+
+NUMBER = 20000
+
+
+def _extend_instance_uncached(obj, cls):
+    base_cls = obj.__class__
+    obj.__class__ = type(base_cls.__name__, (base_cls, cls), {})
+    return obj
+
+
+def main():
+    db = SQLSoup('sqlite://')
+    db.execute('create table users (id integer primary key, email text)')
+    user_cls = db.users
+
+    def load(extend):
+        # Every request gets a freshly loaded instance of the mapped class
+        user = user_cls.__new__(user_cls)
+        return extend(user, UserMixin)
+
+    for label, extend in (('uncached', _extend_instance_uncached),
+                          ('cached', _extend_instance)):
+        seconds = min(timeit.repeat(lambda: load(extend),
+                                    number=NUMBER, repeat=5))
+        print(f'{label:>8}: {seconds / NUMBER * 1e6:8.2f} us per user load')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,3 +3,5 @@ from .base import SecureAdminBlueprint
 from .security import (SUPER_ROLE, SecureRedirectIndex, SecureDefaultIndex,
                        SecureModelView, scaffold_form_respecting_roles,
                        scaffold_list_columns_respecting_roles)
+from .contrib import (SQLSoupBackend, DeclarativeBackend,
+                      RoleNamesUserMixin)
@@ -0,0 +1,199 @@
+
+import atexit, json, logging, os, queue
+from threading import Lock, Thread
+
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Text,
+                        DateTime, inspect)
+
+log = logging.getLogger(__name__)
+
+# Stands in for the values of `audit_redacted_columns`
+REDACTED = '<redacted>'
+
+audit_log_table = Table(
+    'admin_audit_log', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('at', DateTime, nullable=False),
+    Column('actor', String(255)),
+    Column('view', String(255)),
+    Column('table_name', String(255)),
+    Column('action', String(32), nullable=False),
+    Column('row_id', String(255)),
+    Column('changes', Text)
+)
+
+
+def row_identity(model):
+    """ `model`'s primary key value (a list, if composite). """
+    identity = inspect(model).identity
+    if identity is None:
+        return None
+    return identity[0] if len(identity) == 1 else list(identity)
+
+
+def _redact(key, value, redacted):
+    return REDACTED if key in redacted and value is not None else value
+
+
+def model_changes(model, redacted=()):
+    """ {column: [before, after]} for each of `model`'s columns which
+        changed since it was loaded (every one set, for a new model),
+        and {relationship: {'added': [...], 'removed': [...]}} (by
+        primary key) for each changed relationship. """
+    state = inspect(model)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if not history.has_changes():
+            continue
+        before = history.deleted[0] if history.deleted else None
+        after = history.added[0] if history.added else None
+        changes[attr.key] = [_redact(attr.key, before, redacted),
+                             _redact(attr.key, after, redacted)]
+    for relationship in state.mapper.relationships:
+        history = state.attrs[relationship.key].history
+        if history.has_changes():
+            changes[relationship.key] = dict(
+                added=[row_identity(m) for m in history.added if m is not None],
+                removed=[row_identity(m) for m in history.deleted
+                         if m is not None])
+    return changes
+
+
+def model_values(model, redacted=()):
+    """ {column: [value, None]}, for a model about to be deleted. """
+    state = inspect(model)
+    return {attr.key: [_redact(attr.key, getattr(model, attr.key), redacted),
+                       None]
+            for attr in state.mapper.column_attrs}
+
+
+class JSONLAuditSink(object):
+
+    """ Appends audit entries to a file, one JSON object per line. """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, entries):
+        lines = ''.join(json.dumps(entry, default=str) + '\n'
+                        for entry in entries)
+        with open(self.path, 'a') as f:
+            f.write(lines)
+
+
+class TableAuditSink(object):
+
+    """ Inserts audit entries into the 'admin_audit_log' table,
+        creating it if need be, a batch to a statement. """
+
+    def __init__(self, bind):
+        self.bind = bind
+        audit_log_table.create(bind, checkfirst=True)
+
+    def write(self, entries):
+        rows = [dict(at=entry['at'], actor=entry['actor'],
+                     view=entry['view'], table_name=entry['table'],
+                     action=entry['action'],
+                     row_id=None if entry['row_id'] is None
+                     else str(entry['row_id']),
+                     changes=None if entry['changes'] is None
+                     else json.dumps(entry['changes'], default=str))
+                for entry in entries]
+        with self.bind.begin() as connection:
+            connection.execute(audit_log_table.insert(), rows)
+
+
+class AuditLog(object):
+
+    """ Hands audit entries to a background thread, which writes
+        them to `sink` in batches of up to `batch_size`, so recording
+        one costs a queue put rather than a database round trip.
+        The queue holds at most `maxsize` entries; when it's full,
+        `record` waits up to `put_timeout` seconds for room (holding
+        back the writes being audited), then drops the entry, counting
+        it in `dropped`. Whatever is queued is written on shutdown. """
+
+    def __init__(self, sink, maxsize=10000, batch_size=500,
+                 flush_interval=1.0, put_timeout=1.0):
+        self.sink = sink
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = Lock()
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        # Started on first use, and again in each forked worker,
+        # since threads don't survive a fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.maxsize)
+                self._thread = Thread(target=self._run, daemon=True,
+                                      name='secure-admin-audit')
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def record(self, entry):
+        self._ensure_started()
+        try:
+            self._queue.put(entry, timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            log.warning('Audit log queue is full, dropped an entry')
+
+    def _run(self):
+        entries_queue = self._queue
+        while True:
+            try:
+                entry = entries_queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [entry]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(entries_queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            batch = [entry for entry in batch if entry is not None]
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + stopping):
+                entries_queue.task_done()
+            if stopping:
+                return
+
+    def _write(self, batch):
+        try:
+            self.sink.write(batch)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            log.exception(f'Failed to write {len(batch)} audit entries')
+
+    def flush(self):
+        """ Wait until everything recorded so far has been written. """
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        """ Write whatever is queued, and stop the background thread. """
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return dict(written=self.written, dropped=self.dropped,
+                    failed=self.failed,
+                    queued=self._queue.qsize() if self._queue else 0)
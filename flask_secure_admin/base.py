@@ -1,36 +1,94 @@
 
-import os, re, subprocess
+import os, time
 from itertools import zip_longest
 
-from flask import Flask, request, url_for, abort, Blueprint, redirect
+from flask import (Flask, request, url_for, abort, Blueprint, redirect,
+                   current_app)
 from flask_admin import Admin
 from flask_admin import helpers as admin_helpers, expose
 from flask_security import Security, login_required
 from munch import Munch
 
 from .security import (
-    SecureModelView, SecureRedirectIndex,
+    current_role_names, SecureModelView, SecureRedirectIndex, SecureMetricsView,
     scaffold_list_columns_respecting_roles,
     scaffold_form_respecting_roles, SUPER_ROLE
 )
-from .contrib.sqlsoup import override___name___on_sqlsoup_model, SQLSoupUserDataStore
-from .templates import load_master_template
+from .security.caching import create_table_versions
+from .audit import AuditLog, JSONLAuditSink, TableAuditSink
+from .cache import TTLCache
+from .instrumentation import PhaseHistograms, init_instrumentation
+from .contrib.sqlsoup import SQLSoupBackend, create_read_session
+from .passwords import (configure_password_hashing, password_changed,
+                        hash_passwords)
+from .templates import (load_master_template, enable_bytecode_cache,
+                        precompile_templates, enable_menu_cache)
 from .utils import encrypt_password, create_initial_admin_user
 
 # Inspired by:
 # https://flask-admin.readthedocs.io/en/latest/introduction/#using-flask-security
 
+def _invalidate_user_cache(model=None):
+    """ Drop cached snapshots of `model`, or of everyone
+        if no particular user is concerned. """
+    datastore = current_app.extensions['security'].datastore
+    if model is None:
+        datastore.invalidate_roles()
+    else:
+        datastore.invalidate_user(model)
+
+
 def on_user_change(view, form, model, is_created):
-    model.password = encrypt_password(model.password)
+    # Only hash passwords which were actually typed in; otherwise
+    # saving any other field would hash the existing hash
+    if password_changed(model):
+        model.password = encrypt_password(model.password)
+    _invalidate_user_cache(model)
+
+
+def after_user_change(view, form, model, is_created):
+    # Again once it's committed, in case another request
+    # cached the user as they were in between
+    _invalidate_user_cache(model)
+
+
+def on_user_delete(view, model):
+    _invalidate_user_cache(model)
+
+
+def before_user_bulk_write(view, rows):
+    # Hash all of the imported passwords at once, in parallel
+    with_password = [params for _, params in rows if params.get('password')]
+    hashes = hash_passwords([params['password'] for params in with_password])
+    for params, hashed in zip(with_password, hashes):
+        params['password'] = hashed
+    return rows
+
+
+def after_bulk_write(view):
+    _invalidate_user_cache()
+
+
+def on_role_change(view, form, model, is_created):
+    _invalidate_user_cache()
+
+
+def after_role_change(view, form, model, is_created):
+    _invalidate_user_cache()
+
+
+def on_role_delete(view, model):
+    _invalidate_user_cache()
 
 
 class SecureAdminBlueprint(Blueprint):
 
     """ Requires that a database with the 'users', 'roles', and
-        'users_roles' tables exist. SQLSoup reference to this
-        database should be set on app, as explained in `register`.
-        There is a create.sql file present which can initialize
-        these tables for you in a database of your creating.
+        'users_roles' tables exist. By default, a SQLSoup reference
+        to this database should be set on app, as explained in
+        `register`; otherwise pass a `model_backend`. Missing tables
+        are created on startup, or there is a create.sql file present
+        which can initialize them in a database of your creating.
 
         Additionally, the environment variables SECRET_KEY and
         SECURITY_PASSWORD_SALT must be set. There are additional
@@ -42,20 +100,90 @@ class SecureAdminBlueprint(Blueprint):
 
     DEFAULT_MODELS = ['users', 'roles']
     DEFAULT_VIEW_OPTIONS = [
-        dict(on_model_change=on_user_change),
-        dict()
+        dict(on_model_change=on_user_change,
+             after_model_change=after_user_change,
+             after_model_delete=on_user_delete,
+             before_bulk_write=before_user_bulk_write,
+             after_bulk_write=after_bulk_write),
+        dict(on_model_change=on_role_change,
+             after_model_change=after_role_change,
+             after_model_delete=on_role_delete,
+             after_bulk_write=after_bulk_write)
     ]
 
     def __init__(self, name=None, models=None, view_options=None,
-                 admin_roles_accepted=None, *args, **kwargs):
+                 admin_roles_accepted=None, user_cache_size=None,
+                 user_cache_ttl=60, password_hash_rounds=None,
+                 password_hash_workers=None, schema_snapshot_path=None,
+                 template_cache_dir=None, instrumentation=False,
+                 metrics_token=None, engine_options=None,
+                 read_only_bind=None, menu_cache_size=None,
+                 audit_log_path=None, audit_log_table=False,
+                 audit_queue_size=10000, model_backend=None,
+                 users_bulk_import=False, *args, **kwargs):
         self.app_name = name
         assert self.app_name, "Admin instances must have a name value"
         self.models = models or []
         self.models.extend(self.DEFAULT_MODELS)
         self.view_options = view_options or []
-        self.view_options.extend(self.DEFAULT_VIEW_OPTIONS)
+        user_view_options, role_view_options = self.DEFAULT_VIEW_OPTIONS
+        if users_bulk_import:
+            # Import users from CSV or JSON lines at /admin/users/import/,
+            # hashing their passwords in parallel; see `bulk.py`
+            user_view_options = dict(user_view_options, can_bulk_edit=True)
+        self.view_options.extend([user_view_options, role_view_options])
         self.admin_roles_accepted = admin_roles_accepted or [SUPER_ROLE]
 
+        # Opt in to caching loaded users & roles in-process by passing
+        # a `user_cache_size`; see `CachingUserDatastore`
+        self.user_cache = TTLCache(user_cache_size, user_cache_ttl) \
+            if user_cache_size else None
+
+        # Optionally pin the number of hashing rounds (existing hashes
+        # are upgraded on login), and hash/verify passwords on a pool
+        # of `password_hash_workers` threads; see `passwords.py`
+        self.password_hash_rounds = password_hash_rounds
+        self.password_hash_workers = password_hash_workers
+
+        # Optionally keep the reflected tables in a file at this path,
+        # so workers don't reflect every table from the database on boot
+        self.schema_snapshot_path = schema_snapshot_path
+        # Optionally keep compiled templates in this directory,
+        # so new workers don't have to compile them again
+        self.template_cache_dir = template_cache_dir
+        # Optionally time the phases of each request, reporting them in
+        # a Server-Timing header and at /admin/_metrics for Prometheus,
+        # which can authenticate with `metrics_token` as a bearer token
+        self.histograms = PhaseHistograms() if instrumentation else None
+        self.metrics_token = metrics_token
+        # Optional keyword arguments for `create_engine`, e.g. to size
+        # the connection pool; applied to the model backend's engine & the
+        # `read_only_bind` (a URI or engine) if there is one. List,
+        # details & export views then read from that bind instead.
+        self.engine_options = engine_options
+        self.read_only_bind = read_only_bind
+        self.read_session = None
+        # Opt in to keeping up to `menu_cache_size` rendered menus
+        # (one per role set & active view); see `menu_cache_key`
+        self.menu_cache = TTLCache(menu_cache_size, ttl=None) \
+            if menu_cache_size else None
+        # Optionally record every change made through the model views,
+        # in batches from a background thread, appending them to the
+        # JSON lines file at `audit_log_path`, or inserting them into
+        # the 'admin_audit_log' table with `audit_log_table`; see `audit.py`
+        self.audit_log_path = audit_log_path
+        self.audit_log_table = audit_log_table
+        self.audit_queue_size = audit_queue_size
+        self.audit_log = None
+        # Where models, the session & the user datastore come from;
+        # a `SQLSoupBackend` for app.db unless another is given, e.g.
+        # a `DeclarativeBackend` for prebuilt models, which then
+        # needn't be reflected at startup. See `contrib/backend.py`
+        self.model_backend = model_backend
+        self.backend = None
+        # How long (in seconds) each step of registration took
+        self.startup_timings = {}
+
         # Initialize the below as a best practice,
         # so they can be referenced before assignment
         self.admin = None
@@ -67,9 +195,8 @@ class SecureAdminBlueprint(Blueprint):
             *args, **kwargs)
 
     def register(self, app, options, first_registration=False):
-        """ `app` should have a SQLSoup database set as its `db` attribute.
-            We could easily support a regular SQLAlchemy db as well, but
-            this is all we have for now. """
+        """ Unless the blueprint was given a `model_backend`, `app`
+            should have a SQLSoup database set as its `db` attribute. """
 
         # Secret key must be set in the environment.
         app.config['SECRET_KEY'] = os.environ['SECRET_KEY']
@@ -83,9 +210,30 @@ class SecureAdminBlueprint(Blueprint):
         app.config['SECURITY_REGISTERABLE'] = \
             os.environ.get('SECURITY_REGISTERABLE', False)
 
-        self.admin = self.add_admin(app, app.db, options)
-        self.security = self.add_security(app, app.db, options)
-        self.bootstrap_database(app, app.db)
+        self.backend = self.model_backend or SQLSoupBackend(app.db)
+        db = self.backend.db
+        # Flask-SQLAlchemy only hands out its session & engine
+        # within an app context
+        with app.app_context():
+            self.backend.init_app(app)
+            if self.engine_options:
+                self.backend.configure_engine(self.engine_options)
+            if self.read_only_bind is not None:
+                self.read_session = create_read_session(
+                    self.read_only_bind, self.engine_options)
+
+            self.bootstrap_schema(app, db)
+            self.audit_log = self.create_audit_log(app, db)
+            self.admin = self.add_admin(app, db, options)
+            self.create_search_indexes(app, db)
+            self.create_table_versions(app, db)
+            self.security = self.add_security(app, db, options)
+            configure_password_hashing(app.extensions['security'],
+                                       rounds=self.password_hash_rounds,
+                                       workers=self.password_hash_workers)
+            self.bootstrap_database(app, db)
+        if self.histograms is not None:
+            init_instrumentation(app, self.histograms, self.is_admin_request)
 
 
         @app.teardown_appcontext
@@ -93,7 +241,9 @@ class SecureAdminBlueprint(Blueprint):
             """ Without this, SQLAlchemy pooling errors start to occur
                 due to flask-security's usage of the database in tracking
                 users. """
-            app.db.session.remove()
+            self.backend.session.remove()
+            if self.read_session is not None:
+                self.read_session.remove()
 
         # Add stuff to flask-security templates that is needed by flask-admin
         @self.security.context_processor
@@ -104,9 +254,17 @@ class SecureAdminBlueprint(Blueprint):
                 h=admin_helpers,
                 get_url=url_for
             )
+        if self.template_cache_dir:
+            enable_bytecode_cache(app, self.template_cache_dir)
+        if self.menu_cache is not None:
+            enable_menu_cache(app, self.menu_cache, self.menu_cache_key)
         load_master_template(app)
         super(SecureAdminBlueprint, self).register(
             app, options, first_registration)
+        if self.template_cache_dir:
+            started = time.perf_counter()
+            precompile_templates(app)
+            self.record_startup_timing(app, 'templates', started)
 
     def get_index_view(self):
         """ Hook for overriding the admin's IndexView. """
@@ -126,10 +284,11 @@ class SecureAdminBlueprint(Blueprint):
 
     def add_layout_to_admin(self, admin, app, db, options):
         """ Add auth views, and for each additional model specified
-            get the model from the database which must be set on app. """
+            get the model from the blueprint's model backend. """
 
         for model_name, view_options_bag in zip_longest(
                 self.models, self.view_options, fillvalue={}):
+            started = time.perf_counter()
             view_options_bag = Munch(view_options_bag)
 
             # Add default view options
@@ -144,30 +303,95 @@ class SecureAdminBlueprint(Blueprint):
             if not view_options_bag.get('roles_accepted'):
                 view_options_bag.roles_accepted = self.admin_roles_accepted
 
-            # TODO: SQLSoup-specific
-            model = getattr(db, model_name)
-            model = override___name___on_sqlsoup_model(model)
+            model = self.backend.get_model(model_name)
 
             DerivedModelViewCls = \
                 type(f'Secure{model.__name__}View',
                      (SecureModelView,),
                      view_options_bag)
-            model_view = DerivedModelViewCls(model, db.session)
+            model_view = DerivedModelViewCls(
+                model, self.backend.session,
+                endpoint=view_options_bag.get('endpoint') or model_name,
+                read_session=self.read_session, audit_log=self.audit_log)
             admin.add_view(model_view)
+            self.record_startup_timing(app, model_name, started)
         return admin
 
+    def menu_cache_key(self, admin_view):
+        """ What the menu depends on: the active view, and which views
+            the user may see, which for secure views is decided by
+            their roles. Also how many views there are, so that adding
+            one (e.g. in `on_after_add_layout_to_admin`) invalidates
+            the menus rendered before it. """
+        return (frozenset(current_role_names()),
+                getattr(admin_view, 'endpoint', None),
+                request.script_root, len(self.admin._views),
+                len(self.admin._menu_links))
+
+    def is_admin_request(self):
+        """ Whether the current request is to one of the admin's views,
+            rather than to the rest of the app. """
+        return request.blueprint is not None and request.blueprint in \
+            {view.endpoint for view in self.admin._views}
+
+    def record_startup_timing(self, app, step, started):
+        elapsed = time.perf_counter() - started
+        self.startup_timings[step] = elapsed
+        app.logger.info(f'secure_admin: {step} took {elapsed * 1000:.1f}ms')
+
+    def bootstrap_schema(self, app, db):
+        """ Create the users, roles & users_roles tables,
+            and their indexes, if they don't exist yet. """
+        try:
+            self.backend.bootstrap_schema()
+        except Exception:
+            app.logger.exception('Failed to bootstrap database schema!')
+
+    def create_search_indexes(self, app, db):
+        """ Create the text indexes of views with
+            `search_backend='fulltext'`, if they don't exist yet. """
+        for view in self.admin._views:
+            full_text_search = getattr(view, 'full_text_search', None)
+            if full_text_search is None:
+                continue
+            started = time.perf_counter()
+            try:
+                full_text_search.create_index(self.backend.bind)
+            except Exception:
+                app.logger.exception(
+                    f'Failed to create the search index for {view}!')
+            self.record_startup_timing(
+                app, f'{view.endpoint} search index', started)
+
+    def create_table_versions(self, app, db):
+        """ Create the 'admin_table_versions' table if any view has
+            `conditional_caching`, and have every view count its writes
+            there, since they may show up in that view. """
+        views = [view for view in self.admin._views
+                 if isinstance(view, SecureModelView)]
+        if not any(view.conditional_caching for view in views):
+            return
+        try:
+            create_table_versions(self.backend.bind)
+        except Exception:
+            app.logger.exception('Failed to create admin_table_versions!')
+        for view in views:
+            view.track_changes = True
+
+    def create_audit_log(self, app, db):
+        """ The `AuditLog` for the model views, if auditing. """
+        if self.audit_log_table:
+            sink = TableAuditSink(self.backend.bind)
+        elif self.audit_log_path:
+            sink = JSONLAuditSink(self.audit_log_path)
+        else:
+            return None
+        return AuditLog(sink, maxsize=self.audit_queue_size)
+
     def bootstrap_database(self, app, db):
 
         try:
-            database_name = db._metadata._bind.url.database
-            # TODO: This only works if the psql command is available
-            # and the database is a postgres database
-            command_args = ['psql', database_name, '-c', "select * from users;"]
-            try:
-                completed = subprocess.run(command_args, capture_output=True)
-            except TypeError: # Support py3.6
-                completed = subprocess.run(command_args, stdout=subprocess.PIPE)
-            if re.search('\(0 rows\)', str(completed.stdout)):
+            if not self.backend.users_exist():
                 print('Detected first usage of admin.')
                 print('Creating initial admin user...')
                 create_initial_admin_user(app)
@@ -175,10 +399,7 @@ class SecureAdminBlueprint(Blueprint):
                       'user: admin@example.com, password: password')
                 print('Have fun!')
         except Exception:
-            exc_type, _, exc_tb = sys.exc_info()
-            fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
-            print('Failed to bootstrap database!')
-            print(exc_type, fname, exc_tb.tb_lineno)
+            app.logger.exception('Failed to bootstrap database!')
 
     def add_admin(self, app, db, options):
 
@@ -187,20 +408,27 @@ class SecureAdminBlueprint(Blueprint):
         admin = Admin(app, name=self.app_name, template_mode='bootstrap3',
                             index_view=self.get_index_view())
 
-        # Define relationship between these models;
-        # this must happen before adding the model views
-        # or the relationship won't be acknowledged
-        db.users.relate('roles', db.roles,
-                        secondary=db.users_roles._table)
+        if self.schema_snapshot_path:
+            started = time.perf_counter()
+            self.backend.load_schema_snapshot(self.models + ['users_roles'],
+                                              self.schema_snapshot_path)
+            self.record_startup_timing(app, 'schema snapshot', started)
+
+        self.backend.relate_users_and_roles()
 
         admin = self.on_before_add_layout_to_admin(admin, app, db, options)
         admin = self.add_layout_to_admin(admin, app, db, options)
         admin = self.on_after_add_layout_to_admin(admin, app, db, options)
 
+        if self.histograms is not None:
+            admin.add_view(SecureMetricsView(
+                self.histograms, self.admin_roles_accepted,
+                token=self.metrics_token))
+
         return admin
 
     def add_security(self, app, db, options):
         # Initialize flask-security
-        # TODO: Also sqlsoup specific
-        user_datastore = SQLSoupUserDataStore(db, db.users, db.roles)
+        user_datastore = self.backend.create_user_datastore(
+            cache=self.user_cache)
         return Security(app, user_datastore)
@@ -0,0 +1,55 @@
+
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Boolean,
+                        DateTime, ForeignKey, Index, inspect, text)
+
+# The same tables as create.sql, so they can be created in-process
+# on any database SQLAlchemy supports (including SQLite, for tests)
+metadata = MetaData()
+
+roles = Table(
+    'roles', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(80), nullable=False, unique=True),
+    Column('description', String(255))
+)
+
+users = Table(
+    'users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('email', String(255), nullable=False, unique=True),
+    Column('password', String(255)),
+    Column('active', Boolean),
+    Column('confirmed_at', DateTime)
+)
+
+users_roles = Table(
+    'users_roles', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('role_id', Integer, ForeignKey('roles.id'), nullable=False),
+    # Loading a user's roles joins on user_id, and
+    # loading a role's users on role_id
+    Index('users_roles_user_id_idx', 'user_id'),
+    Index('users_roles_role_id_user_id_idx', 'role_id', 'user_id')
+)
+
+USERS_EXIST_QUERY = text('SELECT EXISTS (SELECT 1 FROM users)')
+
+
+def bootstrap_schema(bind):
+    """ Create whichever of the users, roles & users_roles tables
+        and their indexes are missing. Safe to run on every start. """
+    metadata.create_all(bind, checkfirst=True)
+
+    # create_all only makes indexes along with a new table,
+    # so add any missing from tables which already existed
+    inspector = inspect(bind)
+    for table in metadata.sorted_tables:
+        existing = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind)
+
+
+def users_exist(bind):
+    return bool(bind.execute(USERS_EXIST_QUERY).scalar())
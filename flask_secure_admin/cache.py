@@ -0,0 +1,59 @@
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class TTLCache(object):
+
+    """ A small, thread-safe, in-process cache which evicts the
+        least recently used entry once `maxsize` is reached, and
+        treats entries older than `ttl` seconds as missing.
+        Keeps `hits` & `misses` counters for monitoring. """
+
+    def __init__(self, maxsize=128, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if self.ttl is None or expires_at > monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = None if self.ttl is None else monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard_if(self, predicate):
+        """ Drop every entry whose value matches `predicate`. """
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items()
+                        if predicate(v)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self._entries), maxsize=self.maxsize)
@@ -1,3 +1,6 @@
-
+from .backend import ModelBackend
+from .user_datastore import CachingUserDatastore, RoleNamesUserMixin
 from .sqlsoup import (SQLSoupUserDataStore,
-                      override___name___on_sqlsoup_model)
+                      override___name___on_sqlsoup_model,
+                      load_schema_snapshot, SQLSoupBackend)
+from .declarative import DeclarativeBackend, DeclarativeUserDataStore
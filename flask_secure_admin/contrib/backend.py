@@ -0,0 +1,47 @@
+
+class ModelBackend(object):
+
+    """ Where `SecureAdminBlueprint` gets its models, session and
+        user datastore from. Subclasses set `db` (what the blueprint's
+        hooks are given as `db`), `session` (a scoped session) and
+        `bind` (the engine), in `__init__` or in `init_app`. """
+
+    db = None
+    session = None
+    bind = None
+
+    def init_app(self, app):
+        """ Called first thing when the blueprint is registered. """
+
+    def configure_engine(self, engine_options):
+        """ Apply the blueprint's `engine_options`. """
+        raise NotImplementedError
+
+    def bootstrap_schema(self):
+        """ Create the tables the blueprint needs, if they're missing. """
+        raise NotImplementedError
+
+    def users_exist(self):
+        return self.session.query(
+            self.session.query(self.user_model).exists()).scalar()
+
+    def load_schema_snapshot(self, table_names, path):
+        """ Load reflected tables from a snapshot, where there are any. """
+
+    def get_model(self, name):
+        """ The mapped class for the model called `name`. """
+        raise NotImplementedError
+
+    def relate_users_and_roles(self):
+        """ Make sure users have a `roles` relationship. """
+
+    def create_user_datastore(self, cache=None):
+        raise NotImplementedError
+
+    @property
+    def user_model(self):
+        return self.get_model('users')
+
+    @property
+    def role_model(self):
+        return self.get_model('roles')
@@ -0,0 +1,3 @@
+
+from .backend import DeclarativeBackend
+from .user_datastore import DeclarativeUserDataStore
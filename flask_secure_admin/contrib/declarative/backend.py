@@ -0,0 +1,57 @@
+
+from collections.abc import Mapping
+
+from sqlalchemy import create_engine, inspect
+
+from ..backend import ModelBackend
+from .user_datastore import DeclarativeUserDataStore
+
+
+class DeclarativeBackend(ModelBackend):
+
+    """ Prebuilt, declaratively mapped models, so nothing is reflected
+        at startup. `models` are looked up by their table name, unless
+        given as a dict of names to models; `user_model` & `role_model`
+        are the 'users' & 'roles' models. Pass either a Flask-SQLAlchemy
+        `db`, or a scoped `session` bound to the database. """
+
+    def __init__(self, user_model, role_model, models=(),
+                 db=None, session=None):
+        if (db is None) == (session is None):
+            raise ValueError('Pass either a Flask-SQLAlchemy `db` '
+                             'or a scoped `session`')
+        if not isinstance(models, Mapping):
+            models = {model.__tablename__: model for model in models}
+        self.models = dict(models, users=user_model, roles=role_model)
+        # The datastore commits through `db.session`, so without a
+        # Flask-SQLAlchemy `db`, this stands in for one
+        self.db = db if db is not None else self
+        self.session = db.session if db is not None else session
+
+    def init_app(self, app):
+        self.bind = self.session.get_bind(mapper=inspect(self.user_model))
+
+    def configure_engine(self, engine_options):
+        self.bind = create_engine(self.bind.url, **engine_options)
+        self.session.remove()
+        self.session.configure(bind=self.bind)
+
+    def bootstrap_schema(self):
+        tables = [self.user_model.__table__, self.role_model.__table__]
+        secondary = self.user_model.roles.property.secondary
+        if secondary is not None:
+            tables.append(secondary)
+        self.user_model.metadata.create_all(
+            self.bind, tables=tables, checkfirst=True)
+
+    def get_model(self, name):
+        return self.models[name]
+
+    def relate_users_and_roles(self):
+        if not hasattr(self.user_model, 'roles'):
+            raise TypeError(f'{self.user_model.__name__} needs a `roles` '
+                            'relationship to its roles')
+
+    def create_user_datastore(self, cache=None):
+        return DeclarativeUserDataStore(
+            self.db, self.user_model, self.role_model, cache=cache)
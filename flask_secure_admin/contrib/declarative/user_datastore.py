@@ -0,0 +1,20 @@
+
+from flask_security import RoleMixin, UserMixin
+
+from ..user_datastore import CachingUserDatastore
+
+
+class DeclarativeUserDataStore(CachingUserDatastore):
+
+    """ For declarative models which already include Flask-Security's
+        mixins (e.g. `RoleNamesUserMixin` & `RoleMixin`), so nothing
+        needs patching onto users or roles as they're loaded. """
+
+    def __init__(self, db, user_model, role_model, cache=None):
+        if not issubclass(user_model, UserMixin):
+            raise TypeError(f'{user_model.__name__} must subclass '
+                            'UserMixin (or RoleNamesUserMixin)')
+        if not issubclass(role_model, RoleMixin):
+            raise TypeError(f'{role_model.__name__} must subclass RoleMixin')
+        CachingUserDatastore.__init__(
+            self, db, user_model, role_model, cache=cache)
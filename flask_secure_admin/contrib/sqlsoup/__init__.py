@@ -1,3 +1,6 @@
 
 from .str_representation import override___name___on_sqlsoup_model
 from .user_datastore import SQLSoupUserDataStore
+from .schema_snapshot import load_schema_snapshot, schema_fingerprint
+from .engine import configure_engine, create_read_session
+from .backend import SQLSoupBackend
@@ -0,0 +1,48 @@
+
+from ...bootstrap import bootstrap_schema, users_exist
+from ..backend import ModelBackend
+from .engine import configure_engine
+from .schema_snapshot import load_schema_snapshot
+from .str_representation import override___name___on_sqlsoup_model
+from .user_datastore import SQLSoupUserDataStore
+
+
+class SQLSoupBackend(ModelBackend):
+
+    """ Models reflected from the database by a SQLSoup `db`,
+        by table name. This is what the blueprint uses by default,
+        with the SQLSoup database set as `app.db`. """
+
+    def __init__(self, db):
+        self.db = db
+        self.session = db.session
+
+    @property
+    def bind(self):
+        return self.db.bind
+
+    def configure_engine(self, engine_options):
+        configure_engine(self.db, engine_options)
+
+    def bootstrap_schema(self):
+        bootstrap_schema(self.bind)
+
+    def users_exist(self):
+        return users_exist(self.bind)
+
+    def load_schema_snapshot(self, table_names, path):
+        load_schema_snapshot(self.db, table_names, path)
+
+    def get_model(self, name):
+        return override___name___on_sqlsoup_model(getattr(self.db, name))
+
+    def relate_users_and_roles(self):
+        # Define relationship between these models;
+        # this must happen before adding the model views
+        # or the relationship won't be acknowledged
+        self.db.users.relate('roles', self.db.roles,
+                             secondary=self.db.users_roles._table)
+
+    def create_user_datastore(self, cache=None):
+        return SQLSoupUserDataStore(self.db, self.db.users, self.db.roles,
+                                    cache=cache)
@@ -0,0 +1,21 @@
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+
+def configure_engine(db, engine_options):
+    """ Replace the SQLSoup `db`'s engine with one for the same
+        database, created with `engine_options` (e.g. `pool_size`,
+        `max_overflow`, `pool_pre_ping`, `pool_recycle`). """
+    old_engine = db._metadata.bind
+    db._metadata.bind = create_engine(old_engine.url, **engine_options)
+    old_engine.dispose()
+    return db._metadata.bind
+
+
+def create_read_session(bind, engine_options=None):
+    """ A scoped session for read-only queries, on `bind`,
+        which may be a database URI or an engine. """
+    if isinstance(bind, str):
+        bind = create_engine(bind, **(engine_options or {}))
+    return scoped_session(sessionmaker(bind=bind, autoflush=False))
@@ -0,0 +1,98 @@
+
+import hashlib, logging, os, pickle, tempfile
+
+import sqlalchemy
+from sqlalchemy import bindparam, text
+
+log = logging.getLogger(__name__)
+
+SQLITE_FINGERPRINT_QUERY = text(
+    "SELECT type, name, tbl_name, sql FROM sqlite_master "
+    "WHERE tbl_name IN :table_names ORDER BY type, name"
+).bindparams(bindparam('table_names', expanding=True))
+
+INFORMATION_SCHEMA_FINGERPRINT_QUERY = text(
+    "SELECT table_schema, table_name, column_name, data_type, "
+    "is_nullable, column_default, character_maximum_length "
+    "FROM information_schema.columns "
+    "WHERE table_name IN :table_names "
+    "ORDER BY table_schema, table_name, ordinal_position"
+).bindparams(bindparam('table_names', expanding=True))
+
+INFORMATION_SCHEMA_KEYS_QUERY = text(
+    "SELECT table_name, constraint_name, column_name "
+    "FROM information_schema.key_column_usage "
+    "WHERE table_name IN :table_names "
+    "ORDER BY table_name, constraint_name, ordinal_position"
+).bindparams(bindparam('table_names', expanding=True))
+
+
+def schema_fingerprint(bind, table_names):
+    """ A hash of the definitions of `table_names`, made from one or two
+        catalog queries, which is far cheaper than reflecting them.
+        Includes SQLAlchemy's version, since its pickled `Table`s
+        aren't guaranteed to load under another. """
+    table_names = sorted(table_names)
+    if bind.dialect.name == 'sqlite':
+        queries = [SQLITE_FINGERPRINT_QUERY]
+    else:
+        queries = [INFORMATION_SCHEMA_FINGERPRINT_QUERY,
+                   INFORMATION_SCHEMA_KEYS_QUERY]
+    digest = hashlib.sha256(repr(table_names).encode('utf-8'))
+    digest.update(sqlalchemy.__version__.encode('utf-8'))
+    for query in queries:
+        for row in bind.execute(query, table_names=table_names):
+            digest.update(repr(tuple(row)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_schema_snapshot(db, table_names, path):
+    """ Put the `Table`s for `table_names` into the SQLSoup `db`'s
+        metadata, so that SQLSoup finds them there instead of
+        reflecting them one by one from the database.
+
+        They come from the snapshot at `path` when its fingerprint
+        still matches the database's; otherwise they're reflected
+        in one go and the snapshot is rewritten.
+        Returns True if the snapshot could be used. """
+    bind = db._metadata.bind
+    fingerprint = schema_fingerprint(bind, table_names)
+
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        snapshot = None
+    except Exception:
+        # Unreadable, or pickled by another version of SQLAlchemy;
+        # either way, reflecting will replace it
+        log.warning(f'Could not load the schema snapshot at {path}, '
+                    'reflecting instead', exc_info=True)
+        snapshot = None
+
+    if isinstance(snapshot, dict) and \
+            snapshot.get('fingerprint') == fingerprint:
+        for table in snapshot['metadata'].sorted_tables:
+            if table.key not in db._metadata.tables:
+                table.tometadata(db._metadata)
+        return True
+
+    db._metadata.reflect(bind=bind, only=list(table_names))
+
+    # Write to a temporary file first, so that other workers
+    # starting up at the same time never see half a snapshot
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+            temp_path = f.name
+            pickle.dump(dict(fingerprint=fingerprint,
+                             metadata=db._metadata), f)
+        os.replace(temp_path, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        # The snapshot only saves time, so starting without one is fine
+        log.warning(f'Could not write the schema snapshot to {path}',
+                    exc_info=True)
+        if temp_path is not None and os.path.exists(temp_path):
+            os.unlink(temp_path)
+    return False
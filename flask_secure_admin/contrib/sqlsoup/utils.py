@@ -1,8 +1,20 @@
 
+# Derived classes made by `_extend_instance`, keyed by (base class, mixin),
+# so that loading a user doesn't create a brand new type every request
+_EXTENDED_CLASSES = {}
+
+
+def _extended_class(base_cls, cls):
+    try:
+        return _EXTENDED_CLASSES[(base_cls, cls)]
+    except KeyError:
+        extended_cls = type(base_cls.__name__, (base_cls, cls), {})
+        return _EXTENDED_CLASSES.setdefault((base_cls, cls), extended_cls)
+
 
 def _extend_instance(obj, cls):
     """Apply mixins to a class instance after creation """
     base_cls = obj.__class__
-    base_cls_name = obj.__class__.__name__
-    obj.__class__ = type(base_cls_name, (base_cls, cls), {})
+    if not issubclass(base_cls, cls):
+        obj.__class__ = _extended_class(base_cls, cls)
     return obj
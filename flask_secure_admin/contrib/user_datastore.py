@@ -0,0 +1,147 @@
+
+from flask import g
+from flask_security import SQLAlchemyUserDatastore, UserMixin
+from flask_security.signals import password_changed, password_reset
+from flask_security.utils import get_identity_attributes
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+
+class RoleNamesUserMixin(UserMixin):
+
+    """ Answers `has_role` from the frozen set of role names
+        which the datastores attach to a loaded user, rather
+        than walking the `roles` relationship each time. """
+
+    def has_role(self, role):
+        role_name = getattr(role, 'name', role)
+        role_names = getattr(self, 'role_names', None)
+        if role_names is None:
+            role_names = self.role_names = \
+                frozenset(r.name for r in self.roles)
+        return role_name in role_names
+
+
+class CachingUserDatastore(SQLAlchemyUserDatastore):
+
+    """ Loads users together with their roles, and optionally takes
+        a `TTLCache` in which to keep detached snapshots of loaded
+        users & roles. A cached snapshot is merged into the current
+        session without any SQL, so each request still gets its own
+        session-bound user. `db` only needs a scoped `session`.
+        Whatever Flask-Security saves or deletes through the datastore
+        (e.g. a changed, reset or rehashed password) is dropped from
+        the cache, both then and once it's committed. """
+
+    def __init__(self, db, user_model, role_model, cache=None):
+        self.cache = cache
+        SQLAlchemyUserDatastore.__init__(self, db, user_model, role_model)
+        password_changed.connect(self._on_password_change)
+        password_reset.connect(self._on_password_change)
+
+    def wrap_user(self, user):
+        """ Hook for preparing a loaded user for Flask-Security. """
+        if user is not None:
+            user.role_names = frozenset(r.name for r in user.roles)
+        return user
+
+    def wrap_role(self, role):
+        """ Hook for preparing a loaded role for Flask-Security. """
+        return role
+
+    def user_query(self, session=None):
+        """ Load users together with their roles, in one query. """
+        session = session or self.db.session
+        return session.query(self.user_model).options(
+            joinedload(self.user_model.roles))
+
+    def _cached(self, key, load):
+        if self.cache is None:
+            return load(self.db.session)
+        snapshot = self.cache.get(key)
+        if snapshot is None:
+            # Load in a throwaway session, so the snapshot
+            # comes out detached but fully loaded
+            session = self.db.session.session_factory()
+            try:
+                snapshot = load(session)
+            finally:
+                session.close()
+            if snapshot is None:
+                return None
+            self.cache.set(key, snapshot)
+        return self.db.session.merge(snapshot, load=False)
+
+    def invalidate_user(self, user):
+        if self.cache is not None:
+            self.cache.discard_if(
+                lambda snapshot: isinstance(snapshot, self.user_model) and
+                snapshot.id == user.id)
+
+    def invalidate_roles(self):
+        # Any user snapshot might hold the role which changed
+        if self.cache is not None:
+            self.cache.clear()
+
+    def invalidate(self, model):
+        """ Drop whatever is cached of `model`, a user or role. """
+        if isinstance(model, self.user_model):
+            self.invalidate_user(model)
+        elif isinstance(model, self.role_model):
+            self.invalidate_roles()
+
+    def _changed(self, model):
+        # Invalidated now, and again on commit, in case another
+        # request cached the old row in between
+        if self.cache is not None:
+            self.invalidate(model)
+            g.setdefault('secure_admin_changed_users', []).append(model)
+
+    def put(self, model):
+        self._changed(model)
+        return SQLAlchemyUserDatastore.put(self, model)
+
+    def delete(self, model):
+        self._changed(model)
+        SQLAlchemyUserDatastore.delete(self, model)
+
+    def commit(self):
+        SQLAlchemyUserDatastore.commit(self)
+        for model in g.pop('secure_admin_changed_users', ()):
+            self.invalidate(model)
+
+    def _on_password_change(self, app, user=None, **kwargs):
+        if user is not None and \
+                app.extensions['security'].datastore is self:
+            self.invalidate_user(user)
+
+    def _get_user(self, session, identifier):
+        if self._is_numeric(identifier):
+            return self.user_query(session).get(identifier)
+        for attr in get_identity_attributes():
+            query = func.lower(getattr(self.user_model, attr)) \
+                == func.lower(identifier)
+            user = self.user_query(session).filter(query).first()
+            if user is not None:
+                return user
+
+    def get_user(self, identifier):
+        return self.wrap_user(self._cached(
+            ('get_user', str(identifier).lower()),
+            lambda session: self._get_user(session, identifier)
+        ))
+
+    def find_user(self, **kwargs):
+        return self.wrap_user(self._cached(
+            ('find_user', tuple(sorted(kwargs.items()))),
+            lambda session: self.user_query(session).filter_by(
+                **kwargs).first()
+        ))
+
+    def find_role(self, role):
+        role = self._cached(
+            ('find_role', role),
+            lambda session: session.query(self.role_model).filter_by(
+                name=role).first()
+        )
+        return None if role is None else self.wrap_role(role)
@@ -67,3 +67,6 @@ ALTER TABLE ONLY public.users_roles
     ADD CONSTRAINT users_roles_user_id_fkey FOREIGN KEY (user_id) REFERENCES public.users(id);
 ALTER TABLE ONLY public.users_roles
     ADD CONSTRAINT users_roles_pkey PRIMARY KEY (id);
+
+CREATE INDEX users_roles_user_id_idx ON public.users_roles USING btree (user_id);
+CREATE INDEX users_roles_role_id_user_id_idx ON public.users_roles USING btree (role_id, user_id);
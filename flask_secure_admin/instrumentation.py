@@ -0,0 +1,130 @@
+
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+
+from flask import g, request
+from flask_security import current_user
+
+# Upper bounds (in seconds) of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_NAME = 'secure_admin_phase_seconds'
+
+
+class PhaseHistograms(object):
+
+    """ Histograms of how long each phase of a request took,
+        labelled by view & phase, in Prometheus' format. """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._histograms = defaultdict(
+            lambda: [[0] * (len(buckets) + 1), 0.0])
+        self._lock = Lock()
+
+    def observe(self, view, phase, seconds):
+        with self._lock:
+            histogram = self._histograms[(view, phase)]
+            histogram[0][bisect_left(self.buckets, seconds)] += 1
+            histogram[1] += seconds
+
+    def to_prometheus(self):
+        lines = [f'# HELP {METRIC_NAME} Time spent in each phase '
+                 'of secure admin requests.',
+                 f'# TYPE {METRIC_NAME} histogram']
+        with self._lock:
+            histograms = sorted(
+                (key, list(counts), total)
+                for key, (counts, total) in self._histograms.items())
+        for (view, phase), counts, total in histograms:
+            labels = f'view="{view}",phase="{phase}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{METRIC_NAME}_bucket'
+                             f'{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_sum{{{labels}}} {total}')
+            lines.append(f'{METRIC_NAME}_count{{{labels}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def _timing(phase):
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings = g.secure_admin_timings
+        timings[phase] = timings.get(phase, 0.0) + perf_counter() - started
+
+
+@contextmanager
+def _not_timing():
+    yield
+
+
+def timed_phase(phase):
+    """ Time the enclosed block as `phase` of the current request,
+        if instrumentation is on; otherwise do nothing. Repeated
+        phases (e.g. an access check per view) add up. """
+    if 'secure_admin_timings' in g:
+        return _timing(phase)
+    return _not_timing()
+
+
+def _request_view():
+    endpoint = request.endpoint or 'unknown'
+    return endpoint.rsplit('.', 1)[0]
+
+
+def _user_loader(login_manager):
+    # Flask-Login 0.5 renamed `user_callback` to `_user_callback`
+    for name in ('_user_callback', 'user_callback'):
+        user_loader = getattr(login_manager, name, None)
+        if user_loader is not None:
+            return user_loader
+    raise RuntimeError('Flask-Login has no user loader to time')
+
+
+def init_instrumentation(app, histograms, is_timed):
+    """ Time each request to `app` for which `is_timed()` is true
+        (i.e. to the admin's views), and the phases recorded with
+        `timed_phase` along the way, reporting them in `histograms`,
+        and to logged in users in a Server-Timing header. """
+
+    user_loader = _user_loader(app.login_manager)
+
+    @app.login_manager.user_loader
+    def timed_user_loader(*args, **kwargs):
+        with timed_phase('user'):
+            return user_loader(*args, **kwargs)
+
+    def start_timing():
+        if is_timed():
+            g.secure_admin_timings = {}
+            g.secure_admin_request_started = perf_counter()
+
+    # On the app, not the admin's blueprints, to run before
+    # Flask-Principal's hook, which loads the user
+    app.before_request_funcs.setdefault(None, []).insert(0, start_timing)
+
+    @app.after_request
+    def report_timing(response):
+        timings = g.pop('secure_admin_timings', None)
+        if timings is None:
+            return response
+        timings['total'] = perf_counter() - g.secure_admin_request_started
+        view = _request_view()
+        for phase, seconds in timings.items():
+            histograms.observe(view, phase, seconds)
+        # Timings say something about the data, so keep them from
+        # anyone who isn't logged in (e.g. being sent to log in)
+        if current_user and current_user.is_authenticated:
+            response.headers.add('Server-Timing', ', '.join(
+                f'{phase};dur={seconds * 1000:.2f}'
+                for phase, seconds in timings.items()))
+        return response
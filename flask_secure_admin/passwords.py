@@ -0,0 +1,86 @@
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from flask import current_app
+from flask_security.utils import config_value, get_hmac, use_double_hash
+from sqlalchemy.orm.attributes import get_history
+
+
+def password_changed(model):
+    """ Whether `model.password` was set to something new
+        since it was loaded, i.e. it still needs hashing. """
+    return bool(model.password) and \
+        get_history(model, 'password').has_changes()
+
+
+class PooledPasswordContext(object):
+
+    """ Stands in for Flask-Security's passlib `CryptContext`,
+        running its expensive `hash` and `verify` calls on a
+        bounded pool of workers. The caller still waits for the
+        result; the pool caps how many hashes run at once, so a
+        login storm can't take every core, and lets `map` hash many
+        passwords in parallel (PBKDF2 & bcrypt release the GIL).
+        Everything else is passed through to the real context. """
+
+    def __init__(self, context, max_workers=4, executor=None):
+        self.context = context
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers, thread_name_prefix='secure-admin-password')
+
+    def __getattr__(self, name):
+        return getattr(self.context, name)
+
+    def hash(self, *args, **kwargs):
+        return self.executor.submit(
+            self.context.hash, *args, **kwargs).result()
+
+    # Older passlib name for `hash`, still used by some Flask-Security paths
+    encrypt = hash
+
+    def verify(self, *args, **kwargs):
+        return self.executor.submit(
+            self.context.verify, *args, **kwargs).result()
+
+    def map(self, method, *iterables):
+        """ Run one of the context's methods on many inputs
+            at once, e.g. `map('hash', passwords)`. """
+        return list(self.executor.map(
+            getattr(self.context, method), *iterables))
+
+
+def configure_password_hashing(security_state, rounds=None, workers=None):
+    """ Apply the blueprint's password hashing options to the app's
+        Flask-Security state. Pinning `rounds` also makes passlib
+        report existing hashes with other rounds as needing an update,
+        so Flask-Security rehashes them the next time their owner
+        logs in. """
+    context = security_state.pwd_context
+    if rounds:
+        scheme = security_state.password_hash
+        context.update(**{f'{scheme}__default_rounds': rounds,
+                          f'{scheme}__min_rounds': rounds,
+                          f'{scheme}__max_rounds': rounds})
+    if workers:
+        security_state.pwd_context = \
+            PooledPasswordContext(context, max_workers=workers)
+    return security_state.pwd_context
+
+
+def hash_passwords(passwords, max_workers=None):
+    """ Hash many passwords at once, the same way Flask-Security's
+        `hash_password` would, but in parallel: on the configured
+        pool if there is one, otherwise on a pool of `max_workers`
+        threads for just this call. Must be called in an app context. """
+    security_state = current_app.extensions['security']
+    if use_double_hash():
+        passwords = [get_hmac(p).decode('ascii') for p in passwords]
+    options = config_value('PASSWORD_HASH_OPTIONS', default={}).get(
+        security_state.password_hash, {})
+    context = security_state.pwd_context
+    if isinstance(context, PooledPasswordContext):
+        return list(context.executor.map(
+            partial(context.context.hash, **options), passwords))
+    with ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(partial(context.hash, **options), passwords))
@@ -1,7 +1,8 @@
 
 from .data import SUPER_ROLE
-from .model_view import SecureModelView
+from .model_view import SecureModelView, current_role_names
 from .indexes import SecureRedirectIndex, SecureDefaultIndex
+from .metrics_view import SecureMetricsView
 from .role_scaffolding import (
     scaffold_list_columns_respecting_roles,
     scaffold_form_respecting_roles
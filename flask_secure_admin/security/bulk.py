@@ -0,0 +1,177 @@
+
+import csv, io, json
+from itertools import groupby
+
+from sqlalchemy import bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+# How many rows are written in each transaction, by default
+CHUNK_SIZE = 500
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# Name of the bound parameter for the primary key in updates & deletes,
+# which mustn't clash with a column's
+PK_PARAM = 'pk_'
+
+
+def read_rows(stream, import_format):
+    """ (line number, row, error) for each row of an uploaded CSV
+        (with a header) or JSON lines file; `row` is a dict of column
+        names to values, or None if the line couldn't be read. """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if import_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, 'More values than columns'
+            else:
+                yield reader.line_num, row, None
+        return
+    for line_num, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_num, None, f'Invalid JSON: {e}'
+            continue
+        if isinstance(row, dict):
+            yield line_num, row, None
+        else:
+            yield line_num, None, 'Expected a JSON object'
+
+
+def _form_value(value):
+    """ How a JSON value would have been typed into the form. """
+    if value is None or value is False:
+        return ''
+    if value is True:
+        return 'y'
+    return str(value)
+
+
+def validate_row(form_class, row, columns, partial=False):
+    """ Validate `row` against `form_class`, so imported rows get the
+        same checks & conversions as rows created through the form.
+        `columns` maps the form's field names to table column names;
+        anything else in the row is refused, which keeps out columns
+        the user can't see. With `partial`, only the fields present
+        are checked. Returns (parameters, None) or (None, error). """
+    unknown = set(row) - set(columns)
+    if unknown:
+        return None, f"Unknown columns: {', '.join(sorted(unknown))}"
+    form = form_class(
+        formdata=MultiDict({k: _form_value(v) for k, v in row.items()}),
+        meta=dict(csrf=False))
+    form.validate()
+    errors = [f"{name}: {' '.join(map(str, messages))}"
+              for name, messages in form.errors.items()
+              if not partial or name in row]
+    if errors:
+        return None, '; '.join(errors)
+    return {columns[name]: form[name].data for name in row}, None
+
+
+def _grouped(chunk):
+    """ Runs of rows with the same columns, each of
+        which can be sent as a single `executemany`. """
+    for _, rows in groupby(chunk, key=lambda row: sorted(row[1])):
+        yield [params for _, params in rows]
+
+
+class _Unmatched(Exception):
+    """ A statement matched fewer rows than it was given. """
+
+
+def _execute(session, statements, params, mapper, match):
+    """ Execute each of `statements` for all of `params`. With `match`,
+        the last one (on the model's own table) must match a row for
+        each, as an update or delete by primary key should. """
+    for statement in statements[:-1]:
+        session.execute(statement, params, mapper=mapper)
+    statement = statements[-1]
+    if not match:
+        session.execute(statement, params, mapper=mapper)
+        return
+    dialect = session.get_bind(mapper=mapper).dialect
+    # Some drivers can't count the rows an executemany matched
+    batches = [params] if dialect.supports_sane_multi_rowcount \
+        else [[p] for p in params]
+    for batch in batches:
+        result = session.execute(statement, batch, mapper=mapper)
+        if result.rowcount != len(batch):
+            raise _Unmatched
+
+
+def write_rows(session, statements, rows, chunk_size, mapper,
+               match_key=None):
+    """ Execute each of `statements` for every one of `rows` (pairs
+        of line number & parameters) with `executemany`, a chunk at a
+        time, committing after each chunk. A chunk which fails is
+        retried a row at a time, so a bad row only costs itself, and
+        the chunks before it stay committed. `session` should be one
+        of the write's own, so nothing else gets committed with it.
+        For updates & deletes, `match_key` names the primary key, and
+        a row which matches nothing fails with e.g. "No row with id 9".
+        Returns how many rows were written, and (line number, error)
+        for each which wasn't. """
+    match = match_key is not None
+    written, errors = 0, []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            for params in _grouped(chunk):
+                _execute(session, statements, params, mapper, match)
+            session.commit()
+            written += len(chunk)
+            continue
+        except (SQLAlchemyError, _Unmatched):
+            session.rollback()
+        for line_num, params in chunk:
+            try:
+                _execute(session, statements, [params], mapper, match)
+                session.commit()
+                written += 1
+            except _Unmatched:
+                session.rollback()
+                errors.append(
+                    (line_num, f'No row with {match_key} {params[PK_PARAM]}'))
+            except SQLAlchemyError as e:
+                session.rollback()
+                errors.append((line_num, str(getattr(e, 'orig', None) or e)))
+    return written, errors
+
+
+def insert_statements(mapper):
+    return [mapper.local_table.insert()]
+
+
+def update_statements(mapper, pk):
+    return [mapper.local_table.update().where(pk == bindparam(PK_PARAM))]
+
+
+def delete_statements(mapper, pk):
+    """ Deletes rows by primary key, and first their rows in any
+        association tables, as the ORM would when deleting them. """
+    statements = []
+    for relationship in mapper.relationships:
+        if relationship.secondary is None:
+            continue
+        for local, remote in relationship.synchronize_pairs:
+            if local is pk:
+                statements.append(relationship.secondary.delete().where(
+                    remote == bindparam(PK_PARAM)))
+    statements.append(
+        mapper.local_table.delete().where(pk == bindparam(PK_PARAM)))
+    return statements
+
+
+def coerce_pk(pk, value):
+    """ `value` (e.g. from a CSV file or a form) as the primary key's
+        Python type, if it has one; otherwise leave it to the database. """
+    try:
+        return pk.type.python_type(value)
+    except (NotImplementedError, TypeError, ValueError):
+        return value
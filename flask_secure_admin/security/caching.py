@@ -0,0 +1,48 @@
+
+import hashlib
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, select
+from sqlalchemy.exc import IntegrityError
+
+# How many times each table was changed through the admin, for views
+# with `conditional_caching` to tell if pages are stale. Not one of the
+# baseline tables; it's only created once such a view is registered.
+table_versions = Table(
+    'admin_table_versions', MetaData(),
+    Column('table_name', String(255), primary_key=True),
+    Column('version', Integer, nullable=False)
+)
+
+
+def create_table_versions(bind):
+    table_versions.create(bind, checkfirst=True)
+
+
+def bump_table_version(session, table_name, mapper):
+    """ Record that `table_name` changed, in its own transaction. """
+    version = table_versions.c.version
+    update = table_versions.update() \
+        .where(table_versions.c.table_name == table_name) \
+        .values(version=version + 1)
+    if not session.execute(update, mapper=mapper).rowcount:
+        try:
+            session.execute(table_versions.insert().values(
+                table_name=table_name, version=1), mapper=mapper)
+        except IntegrityError:
+            # Someone else inserted it first
+            session.rollback()
+            session.execute(update, mapper=mapper)
+    session.commit()
+
+
+def get_table_versions(session, table_names, mapper):
+    """ (table name, version) for each of `table_names`
+        which has changed, in one query. """
+    query = select([table_versions.c.table_name, table_versions.c.version]) \
+        .where(table_versions.c.table_name.in_(table_names)) \
+        .order_by(table_versions.c.table_name)
+    return tuple(map(tuple, session.execute(query, mapper=mapper)))
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
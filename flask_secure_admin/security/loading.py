@@ -0,0 +1,98 @@
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Load
+
+# Eager loading strategies which `column_relationship_loading` may
+# choose between, as the `Load` methods which apply them. 'joined'
+# loads in the list query itself; 'selectin' & 'subquery' with one
+# more query for the whole page. 'lazy' (or None) loads on access.
+LOADER_METHODS = dict(joined='joinedload', selectin='selectinload',
+                      subquery='subqueryload', lazy=None)
+
+
+def relationship_paths(model, columns):
+    """ The relationships walked to show each of `columns` (pairs
+        of name & label, e.g. 'owner' or 'owner.team.name'), as
+        tuples of relationship keys, leaving out any path which
+        another one continues. """
+    paths = set()
+    for name, _ in columns:
+        mapper = inspect(model)
+        path = ()
+        for key in name.split('.'):
+            relationship = mapper.relationships.get(key)
+            if relationship is None:
+                break
+            path += (key,)
+            mapper = relationship.mapper
+        if path:
+            paths.add(path)
+    return sorted(path for path in paths
+                  if not any(other[:len(path)] == path and other != path
+                             for other in paths))
+
+
+def default_strategy(parent, relationship):
+    """ Join to a single related row, but select collections in
+        (joining them would repeat each row once per related row,
+        and push LIMIT into a subquery), and anything a join can't
+        reach: the same table, or one on a different bind. """
+    source_bind = getattr(parent.class_, '__bind_key__', None)
+    target_bind = getattr(relationship.mapper.class_, '__bind_key__', None)
+    if relationship.uselist or relationship.mapper is parent or \
+            source_bind != target_bind:
+        return 'selectin'
+    return 'joined'
+
+
+def relationship_loaders(model, columns, overrides=None, auto=True,
+                         batched=False):
+    """ Options to eager load the relationships which `columns` show,
+        each with its strategy from `overrides` (keyed by dotted path,
+        e.g. 'owner' or 'owner.team'), or else its `default_strategy`
+        if `auto`. A relationship which isn't eager loaded is lazy
+        loaded, and so is everything beyond it. With `batched`, all
+        of them are selected in, which unlike joins works when rows
+        are fetched a batch at a time (with `yield_per`). """
+    overrides = overrides or {}
+    for strategy in overrides.values():
+        if strategy is not None and strategy not in LOADER_METHODS:
+            raise ValueError(f'Unknown relationship loading strategy '
+                             f"'{strategy}', expected one of "
+                             f'{", ".join(LOADER_METHODS)}')
+    loaders = []
+    for path in relationship_paths(model, columns):
+        mapper = inspect(model)
+        loader = None
+        for depth, key in enumerate(path):
+            relationship = mapper.relationships[key]
+            dotted = '.'.join(path[:depth + 1])
+            if dotted in overrides:
+                strategy = overrides[dotted]
+            elif auto:
+                strategy = default_strategy(mapper, relationship)
+            else:
+                strategy = None
+            if batched and strategy not in (None, 'lazy'):
+                strategy = 'selectin'
+            method = LOADER_METHODS.get(strategy)
+            if method is None:
+                break
+            loader = getattr(loader or Load(model), method)(
+                getattr(mapper.class_, key))
+            mapper = relationship.mapper
+        if loader is not None:
+            loaders.append(loader)
+    return tuple(loaders)
+
+
+def relationship_local_columns(model, columns):
+    """ Keys of the model's own columns which the relationships
+        shown in `columns` are joined on (e.g. 'owner_id'), so that
+        loading only the columns shown doesn't leave them out. """
+    mapper = inspect(model)
+    keys = set()
+    for path in relationship_paths(model, columns):
+        for column in mapper.relationships[path[0]].local_columns:
+            keys.add(mapper.get_property_by_column(column).key)
+    return keys
@@ -0,0 +1,51 @@
+
+from hmac import compare_digest
+
+from flask import request, abort, redirect, url_for, Response
+from flask_admin import BaseView, expose
+from flask_security import current_user
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class SecureMetricsView(BaseView):
+
+    """ Serves the admin's request phase histograms in Prometheus'
+        text format. Open to logged in users with one of the
+        `roles_accepted`, or to anyone presenting `token` as a
+        bearer token (which is what a scraper would do). """
+
+    def __init__(self, histograms, roles_accepted, token=None,
+                 *args, **kwargs):
+        self.histograms = histograms
+        self.roles_accepted = roles_accepted
+        self.token = token
+        kwargs.setdefault('endpoint', '_metrics')
+        kwargs.setdefault('url', '_metrics')
+        super(SecureMetricsView, self).__init__(*args, **kwargs)
+
+    def is_visible(self):
+        return False
+
+    def has_valid_token(self):
+        authorization = request.headers.get('Authorization', '')
+        return bool(self.token) and \
+            compare_digest(authorization, f'Bearer {self.token}')
+
+    def is_accessible(self):
+        if self.has_valid_token():
+            return True
+        return (current_user.is_active and
+                current_user.is_authenticated and
+                any(current_user.has_role(r) for r in self.roles_accepted))
+
+    def _handle_view(self, name, **kwargs):
+        if not self.is_accessible():
+            if current_user.is_authenticated or self.token:
+                abort(403)
+            return redirect(url_for('security.login', next=request.url))
+
+    @expose('/')
+    def index(self):
+        return Response(self.histograms.to_prometheus(),
+                        content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,27 +1,865 @@
 
-from flask import request, abort, redirect, url_for, current_app
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock
+
+from flask import (request, abort, redirect, url_for, current_app, flash,
+                   has_request_context, g, Response, stream_with_context,
+                   make_response, session as cookie_session)
+from flask_admin import expose
+from flask_admin.actions import action
+from flask_admin.babel import lazy_gettext
+from flask_admin.helpers import get_redirect_target
 from flask_admin.contrib import sqla
 from flask_security import current_user
+from flask_admin.contrib.sqla import tools
+from werkzeug.urls import url_encode
+from sqlalchemy import false, func, inspect
+from sqlalchemy.orm import joinedload, load_only
 
+from ..audit import model_changes, model_values, row_identity, REDACTED
+from ..instrumentation import timed_phase
+from .caching import bump_table_version, get_table_versions, make_etag
+from .bulk import (CHUNK_SIZE, IMPORT_FORMATS, PK_PARAM, read_rows,
+                   validate_row, write_rows, insert_statements,
+                   update_statements, delete_statements, coerce_pk)
 from .data import SUPER_ROLE
+from .export import (STREAM_EXPORT_TYPES, EXPORT_TYPE_FORMATTERS,
+                     export_label, stream_rows)
+from .loading import relationship_loaders, relationship_local_columns
+from .pagination import (estimated_row_count, keyset_condition,
+                         keyset_context, dump_keyset, load_keyset)
+from .role_scaffolding import hidden_role_only_columns
+from .search import full_text_search_for
+
+# How many rows to fetch at a time when streaming an export
+STREAM_BATCH_SIZE = 1000
+
+# Views which only read, and so may be served from a read-only bind
+READ_ONLY_VIEWS = ('index_view', 'details_view', 'export',
+                   'stream_export_view')
+
+# Views which can be answered with 304 Not Modified
+CONDITIONAL_VIEWS = ('index_view', 'details_view')
+
+# Everything flask-admin caches on a view which depends on
+# who is looking at it. Built once per role set, never mutated.
+RoleViews = namedtuple('RoleViews', [
+    'list_columns', 'export_columns', 'details_columns',
+    'list_load_only', 'details_load_only', 'list_loaders', 'export_loaders',
+    'create_form_class', 'edit_form_class', 'delete_form_class',
+    'action_form_class', 'list_form_class', 'search_fields'
+])
+
+# What a bulk import did: how many rows it wrote, and
+# (line number, error) for each row that it didn't
+BulkResult = namedtuple('BulkResult', ['written', 'errors'])
+
+
+def current_role_names():
+    """ Names of the current user's roles, looked up once per request
+        so that every view's role check can be answered from a set. """
+    if 'secure_admin_role_names' not in g:
+        role_names = getattr(current_user, 'role_names', None)
+        if role_names is None:
+            role_names = frozenset(
+                r.name for r in getattr(current_user, 'roles', None) or ())
+        g.secure_admin_role_names = role_names
+    return g.secure_admin_role_names
+
+
+def _role_scoped(name):
+    """ A property which resolves `name` from the `RoleViews`
+        of whoever is making the current request. Outside of a
+        request (e.g. while flask-admin builds its caches in
+        `__init__`) the plain, unfiltered value is used. """
+
+    def getter(self):
+        role_views = self.get_role_views()
+        if role_views is None:
+            return self.__dict__.get(name)
+        return getattr(role_views, name.lstrip('_'))
+
+    def setter(self, value):
+        self.__dict__[name] = value
+
+    return property(getter, setter)
+
 
 # Create customized model view class
 class SecureModelView(sqla.ModelView):
 
+    _list_columns = _role_scoped('_list_columns')
+    _export_columns = _role_scoped('_export_columns')
+    _details_columns = _role_scoped('_details_columns')
+    _list_load_only = _role_scoped('_list_load_only')
+    _details_load_only = _role_scoped('_details_load_only')
+    _list_loaders = _role_scoped('_list_loaders')
+    _export_loaders = _role_scoped('_export_loaders')
+    _create_form_class = _role_scoped('_create_form_class')
+    _edit_form_class = _role_scoped('_edit_form_class')
+    _delete_form_class = _role_scoped('_delete_form_class')
+    _action_form_class = _role_scoped('_action_form_class')
+    _list_form_class = _role_scoped('_list_form_class')
+    _search_fields = _role_scoped('_search_fields')
+
+    # View options for large tables. With `keyset_pagination`, the
+    # link to the next page carries a signed seek key (`after`) saying
+    # where the current page ended, and the next page starts from there
+    # with a WHERE clause instead of an OFFSET; pages reached any other
+    # way (or with a stale key) fall back to OFFSET.
+    # Tables estimated to have at least `estimated_count_threshold`
+    # rows show that estimate instead of counting them on every page.
+    keyset_pagination = False
+    estimated_count_threshold = None
+
+    # Whether list & details queries only load the columns which the
+    # view shows to the current user. Turn this off if e.g. a column
+    # formatter reads other columns, which would then be lazy loaded.
+    column_projection = True
+
+    # Related rows are exported by primary key (or their own `__str__`),
+    # not by their repr; see `export_label`
+    column_type_formatters_export = EXPORT_TYPE_FORMATTERS
+
+    # Relationships shown in the list (or exported) are eager loaded
+    # for the whole page, rather than lazy loaded row by row: joined
+    # into the list query when there's one related row, and selected
+    # in with one more query for collections. Map a relationship's
+    # name (or dotted path, e.g. 'owner.team') to 'joined', 'selectin',
+    # 'subquery' or 'lazy' in `column_relationship_loading` to choose
+    # otherwise; with `column_auto_select_related = False`, only those
+    # named there are eager loaded. See `security/loading.py`.
+    column_relationship_loading = None
+
+    # With `search_backend='fulltext'`, the `column_searchable_list`
+    # columns are searched for whole words through a text index
+    # (created when the blueprint is registered) instead of with
+    # ILIKE, and results are ordered by how well they match unless
+    # another sort is chosen. Supported on PostgreSQL, where
+    # `search_config` is the text search configuration, and SQLite.
+    search_backend = None
+    search_config = 'english'
+    search_ranking = True
+
+    # With `conditional_caching`, list & details pages get an ETag,
+    # and reloading one which hasn't changed gets a 304 Not Modified
+    # without querying for or rendering it. Whether the view's table
+    # (or one it's related to) changed is told by counting the changes
+    # made through the admin, and if a `change_marker_column` (e.g.
+    # `updated_at`) is given, by its greatest value & the row count
+    # too, which also notice changes made elsewhere.
+    conditional_caching = False
+    change_marker_column = None
+    # Set by the blueprint once any view has `conditional_caching`, so
+    # that writes through every view count, e.g. to a related table
+    track_changes = False
+
+    # Columns whose values are left out of the audit log,
+    # which just records that they changed
+    audit_redacted_columns = ('password',)
+
+    # Whether rows can be inserted, or updated by primary key, from an
+    # uploaded CSV or JSON lines file at `<view url>/import/`, and
+    # deleted in bulk from the list view; `bulk_chunk_size` rows are
+    # written with each statement, and committed together
+    can_bulk_edit = False
+    bulk_chunk_size = CHUNK_SIZE
+    bulk_import_template = 'admin/model/bulk_import.html'
+
+    def __init__(self, *args, read_session=None, audit_log=None, **kwargs):
+        # Optional session on a read-only bind (e.g. a replica),
+        # for the list, details & export views; see `query_session`
+        self.read_session = read_session
+        # Optional `AuditLog` to record the changes made through the view
+        self.audit_log = audit_log
+        self._role_views_cache = {}
+        self._role_views_lock = Lock()
+        super(SecureModelView, self).__init__(*args, **kwargs)
+        self._list_loaders = self.get_relationship_loaders(self._list_columns)
+        self._export_loaders = \
+            self.get_relationship_loaders(self._export_columns)
+
     def __repr__(self):
         return f"<'{self.name}' ModelView>"
 
+    def role_key(self, role_names):
+        """ The subset of `role_names` which can change what
+            this view looks like, given its `role_only_columns`. """
+        relevant_roles = set(self.role_only_columns or ()) | {SUPER_ROLE}
+        return frozenset(role_names) & relevant_roles
+
+    def build_role_views(self):
+        """ Scaffold forms & list columns for the current user.
+            Only called once per role set; see `get_role_views`. """
+        self._form_ajax_refs = self._process_ajax_references()
+        if self.form_widget_args is None:
+            self.form_widget_args = {}
+        list_columns = tuple(self.get_list_columns())
+        export_columns = tuple(self.get_export_columns())
+        details_columns = tuple(self.get_details_columns())
+        # The list query also serves the exports, when there are any
+        loaded_columns = list_columns + export_columns \
+            if self.can_export else list_columns
+        return RoleViews(
+            list_columns=list_columns,
+            export_columns=export_columns,
+            details_columns=details_columns,
+            list_load_only=self.get_load_only(loaded_columns),
+            details_load_only=self.get_load_only(details_columns),
+            list_loaders=self.get_relationship_loaders(list_columns),
+            export_loaders=self.get_relationship_loaders(export_columns),
+            create_form_class=self.get_create_form(),
+            edit_form_class=self.get_edit_form(),
+            delete_form_class=self.get_delete_form(),
+            action_form_class=self.get_action_form(),
+            list_form_class=(self.get_list_form()
+                             if self.column_editable_list else None),
+            search_fields=self.get_search_fields()
+        )
+
+    def get_role_views(self):
+        """ Look up the `RoleViews` for the current user's role set,
+            building them on first use. Returns None if there is
+            no authenticated user to build them for. """
+        if not (has_request_context() and current_user and
+                current_user.is_authenticated):
+            return None
+        request_role_views = g.setdefault('secure_admin_role_views', {})
+        role_views = request_role_views.get(self.endpoint)
+        if role_views is not None:
+            return role_views
+        key = self.role_key(current_role_names())
+        role_views = self._role_views_cache.get(key)
+        if role_views is None:
+            with self._role_views_lock:
+                role_views = self._role_views_cache.get(key)
+                if role_views is None:
+                    role_views = self.build_role_views()
+                    self._role_views_cache[key] = role_views
+        request_role_views[self.endpoint] = role_views
+        return role_views
+
+    def get_search_fields(self):
+        """ The searchable columns, less any `role_only_columns`
+            the current user isn't allowed to see. """
+        search_fields = self.__dict__.get('_search_fields')
+        if not search_fields:
+            return search_fields
+        hidden_columns = set(hidden_role_only_columns(self))
+        return tuple((column, joins) for column, joins in search_fields
+                     if joins or column.key not in hidden_columns)
+
+    def init_search(self):
+        supported = super(SecureModelView, self).init_search()
+        self.full_text_search = None
+        if supported and self.search_backend == 'fulltext':
+            if any(joins for _, joins in self._search_fields):
+                raise Exception('Full-text search only supports '
+                                "the model's own columns")
+            # None (falling back to ILIKE) on other databases
+            self.full_text_search = full_text_search_for(
+                self.session, self.model,
+                [column.key for column, _ in self._search_fields],
+                self.search_config)
+        return supported
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        if not self._search_fields:
+            # Every searchable column is hidden from this user
+            query = query.filter(false())
+            if count_query is not None:
+                count_query = count_query.filter(false())
+            return query, count_query, joins, count_joins
+        if self.full_text_search is None:
+            return super(SecureModelView, self)._apply_search(
+                query, count_query, joins, count_joins, search)
+        terms = search.split()
+        if terms:
+            query, count_query = self.full_text_search.apply(
+                query, count_query, terms,
+                [column.key for column, _ in self._search_fields])
+        return query, count_query, joins, count_joins
+
+    def get_search_rank(self, search):
+        """ What to order full-text search results by, if ranking. """
+        if self.full_text_search is None or not self.search_ranking or \
+                not self._search_fields or not search.split():
+            return None
+        return self.full_text_search.rank(
+            search.split(), [column.key for column, _ in self._search_fields])
+
+    def get_load_only(self, columns):
+        """ Names of the model's own columns among `columns`
+            (pairs of name & label), to pass to `load_only`. """
+        column_attrs = inspect(self.model).column_attrs.keys()
+        names = {name for name, _ in columns}
+        names |= relationship_local_columns(self.model, columns)
+        return tuple(key for key in column_attrs if key in names)
+
+    def get_export_value(self, model, name):
+        return export_label(
+            super(SecureModelView, self).get_export_value(model, name))
+
+    def get_relationship_loaders(self, columns, batched=False):
+        """ Options to eager load the relationships which `columns`
+            show, unless flask-admin's `column_select_related_list`
+            already says which to join. """
+        if self.column_select_related_list and not batched:
+            return tuple(joinedload(j) for j in self._auto_joins)
+        return relationship_loaders(
+            self.model, columns, self.column_relationship_loading,
+            auto=self.column_auto_select_related, batched=batched)
+
+    def query_session(self):
+        """ The session to query with: the read-only session when
+            there is one and the current view only reads, otherwise
+            the regular one, which all writes go through. """
+        if self.read_session is None or not has_request_context():
+            return self.session
+        endpoint, _, view = (request.endpoint or '').rpartition('.')
+        if endpoint == self.endpoint and view in READ_ONLY_VIEWS:
+            return self.read_session
+        return self.session
+
+    def get_query(self):
+        query = self.query_session().query(self.model)
+        if self.column_projection and self._list_load_only:
+            query = query.options(load_only(*self._list_load_only))
+        return query
+
+    def get_count_query(self):
+        return self.query_session().query(
+            func.count('*')).select_from(self.model)
+
+    def get_one(self, id):
+        query = self.query_session().query(self.model)
+        if self.column_projection and self._details_load_only and \
+                request.endpoint == f'{self.endpoint}.details_view':
+            query = query.options(load_only(*self._details_load_only))
+        return query.get(tools.iterdecode(id))
+
+    def get_row_count(self, count_query, search, filters):
+        """ Count the rows of the list view, or estimate them,
+            if that's allowed and there's no search or filter. """
+        if count_query is None:
+            return None
+        if self.estimated_count_threshold is not None and \
+                not search and not filters:
+            estimate = estimated_row_count(self.query_session(), self.model)
+            if estimate is not None and \
+                    estimate >= self.estimated_count_threshold:
+                return estimate
+        return count_query.scalar()
+
+    def get_keyset(self, sort_column, sort_desc):
+        """ The columns (sort column, then primary key) which
+            uniquely order the list, and whether it's descending.
+            None if the sort involves joins or a nullable column,
+            for which keyset pagination isn't supported. """
+        if isinstance(self._primary_key, tuple):
+            return None
+        pk = getattr(self.model, self._primary_key)
+        if sort_column is not None:
+            if sort_column not in self._sortable_columns or \
+                    self._sortable_joins.get(sort_column):
+                return None
+            sort_field = self._sortable_columns[sort_column]
+        else:
+            order = self._get_default_order()
+            if order is None:
+                return (pk,), False
+            sort_field, sort_joins, sort_desc = order
+            if sort_joins:
+                return None
+        if isinstance(sort_field, tuple):
+            return None
+        if sort_field.key == pk.key:
+            return (pk,), bool(sort_desc)
+        # Rows with NULLs would fall through the WHERE clause
+        if getattr(getattr(sort_field, 'expression', sort_field),
+                   'nullable', True):
+            return None
+        return (sort_field, pk), bool(sort_desc)
+
+    def get_list(self, page, sort_column, sort_desc, search, filters,
+                 execute=True, page_size=None):
+        """ Same as flask-admin's `get_list`, except for how it
+            counts and paginates when the large table options are
+            set, ranking full-text search results, how it eager loads
+            relationships, and that it times the count & the query. """
+        if not execute:
+            return super(SecureModelView, self).get_list(
+                page, sort_column, sort_desc, search, filters,
+                execute=execute, page_size=page_size)
+
+        query, count_query, joins, rank = self.get_filtered_query(
+            sort_column, search, filters,
+            with_count=not self.simple_list_pager)
+
+        with timed_phase('count'):
+            count = self.get_row_count(count_query, search, filters)
+
+        # Eager load the relationships shown, for the whole page
+        if request.endpoint == f'{self.endpoint}.export':
+            query = query.options(*self._export_loaders)
+        else:
+            query = query.options(*self._list_loaders)
+
+        # Sorting
+        query, joins = self._apply_sorting(
+            query, joins, sort_column, sort_desc)
+
+        keyset = self.get_keyset(sort_column, sort_desc) \
+            if self.keyset_pagination and rank is None else None
+        if keyset is None:
+            query = self._apply_pagination(query, page, page_size)
+            with timed_phase('query'):
+                return count, query.all()
+
+        # Keyset pagination
+        columns, descending = keyset
+        pk = columns[-1]
+        # Order by the primary key last, so the order is total
+        if len(columns) > 1 or (sort_column is None and
+                                self._get_default_order() is None):
+            query = query.order_by(pk.desc() if descending else pk)
+
+        if page_size is None:
+            page_size = self.page_size
+        context = self.get_keyset_context(
+            sort_column, sort_desc, search, filters, page_size)
+        secret_key = current_app.secret_key
+        after = load_keyset(secret_key, request.args.get('after'), context,
+                            page, len(columns)) if page and page_size else None
+        if after is not None:
+            query = query.filter(keyset_condition(columns, after, descending))
+            query = query.limit(page_size)
+        else:
+            query = self._apply_pagination(query, page, page_size)
+        with timed_phase('query'):
+            rows = query.all()
+
+        # Link the next page to where this one ended
+        if page_size and len(rows) == page_size:
+            last_values = tuple(getattr(rows[-1], c.key) for c in columns)
+            token = None if None in last_values else dump_keyset(
+                secret_key, context, (page or 0) + 1, last_values)
+            if token is not None:
+                next_pages = g.setdefault('secure_admin_next_pages', {})
+                next_pages[self.endpoint] = ((page or 0) + 1, token)
+        return count, rows
+
+    def get_keyset_context(self, sort_column, sort_desc, search, filters,
+                           page_size):
+        """ What a page's seek key is only good for: the same list,
+            seen by the same role set, which may search & see other
+            rows than another. """
+        return keyset_context(
+            self.endpoint, sorted(self.role_key(current_role_names())),
+            sort_column, bool(sort_desc), search,
+            [tuple(f) for f in filters or ()], page_size)
+
+    def _get_list_url(self, view_args):
+        """ Same as flask-admin's, except that the link to the page
+            after the current one carries its seek key, if it has one. """
+        url = super(SecureModelView, self)._get_list_url(view_args)
+        next_page = g.get('secure_admin_next_pages', {}).get(self.endpoint)
+        if next_page is None or view_args.page != next_page[0]:
+            return url
+        current = self._get_list_extra_args()
+        if (view_args.sort, view_args.sort_desc, view_args.search,
+                view_args.filters, view_args.page_size) != \
+                (current.sort, current.sort_desc, current.search,
+                 current.filters, current.page_size):
+            return url
+        return f"{url}{'&' if '?' in url else '?'}" \
+            f"{url_encode(dict(after=next_page[1]))}"
+
+    def get_filtered_query(self, sort_column, search, filters,
+                           with_count=True):
+        """ The list query with search & filters applied (ordered by
+            search rank, if ranking), its count query (None without
+            `with_count`), the joins made, and the rank ordered by. """
+        # Will contain join paths with optional aliased object
+        joins = {}
+        count_joins = {}
+
+        query = self.get_query()
+        count_query = self.get_count_query() if with_count else None
+
+        # Ignore eager-loaded relations (prevent unnecessary joins)
+        if hasattr(query, '_join_entities'):
+            for entity in query._join_entities:
+                for table in entity.tables:
+                    joins[table] = None
+
+        # Apply search criteria
+        rank = None
+        if self._search_supported and search:
+            query, count_query, joins, count_joins = self._apply_search(
+                query, count_query, joins, count_joins, search)
+            # Best matches first, unless sorting by a column
+            if sort_column is None:
+                rank = self.get_search_rank(search)
+            if rank is not None:
+                query = query.order_by(rank)
+
+        # Apply filters
+        if filters and self._filters:
+            query, count_query, joins, count_joins = self._apply_filters(
+                query, count_query, joins, count_joins, filters)
+
+        return query, count_query, joins, rank
+
+    @expose('/stream/<export_type>/')
+    def stream_export_view(self, export_type):
+        """ Export every row matching the list view's search, filters
+            & sort, as CSV or JSON lines. Rows are fetched through a
+            server-side cursor and written out as they arrive, so memory
+            use doesn't grow with the table. Only columns the user is
+            allowed to see (see `role_only_columns`) are included. """
+        if not self.can_export or export_type not in STREAM_EXPORT_TYPES:
+            abort(404)
+
+        view_args = self._get_list_extra_args()
+        sort_column = self._get_column_by_idx(view_args.sort)
+        if sort_column is not None:
+            sort_column = sort_column[0]
+        # Without counting the rows, which for a big table
+        # could take as long as exporting them
+        query, _, joins, _ = self.get_filtered_query(
+            sort_column, view_args.search, view_args.filters,
+            with_count=False)
+        query, _ = self._apply_sorting(
+            query, joins, sort_column, view_args.sort_desc)
+        # Joined eager loading can't be combined with yield_per,
+        # but selecting in once per batch can
+        rows = query.options(*self.get_relationship_loaders(
+                self._export_columns, batched=True)) \
+            .execution_options(stream_results=True) \
+            .yield_per(STREAM_BATCH_SIZE)
+
+        body, mimetype = stream_rows(
+            self, rows, self._export_columns, export_type)
+        filename = self.get_export_name(export_type)
+        return Response(
+            stream_with_context(body), mimetype=mimetype,
+            headers={'Content-Disposition':
+                     f'attachment;filename={filename}'})
+
+    def audit(self, action, row_id, changes):
+        """ Record a change made through this view, if auditing. """
+        if self.audit_log is None:
+            return
+        self.audit_log.record(dict(
+            at=datetime.utcnow(),
+            actor=getattr(current_user, 'email', None),
+            view=self.endpoint,
+            table=inspect(self.model).local_table.name,
+            action=action, row_id=row_id, changes=changes))
+
+    def _on_model_change(self, form, model, is_created):
+        super(SecureModelView, self)._on_model_change(form, model, is_created)
+        # After `on_model_change`, so changes it makes (like hashing a
+        # user's password) are recorded; but only once they're committed
+        if self.audit_log is not None:
+            g.secure_admin_audit_changes = model_changes(
+                model, self.audit_redacted_columns)
+
+    def create_model(self, form):
+        model = super(SecureModelView, self).create_model(form)
+        changes = g.pop('secure_admin_audit_changes', None)
+        if model and changes is not None:
+            self.audit('create', row_identity(model), changes)
+        return model
+
+    def update_model(self, form, model):
+        updated = super(SecureModelView, self).update_model(form, model)
+        changes = g.pop('secure_admin_audit_changes', None)
+        if updated and changes is not None:
+            self.audit('update', row_identity(model), changes)
+        return updated
+
+    def delete_model(self, model):
+        # Read before deleting, while the row can still be loaded
+        values = model_values(model, self.audit_redacted_columns) \
+            if self.audit_log is not None else None
+        deleted = super(SecureModelView, self).delete_model(model)
+        if deleted and values is not None:
+            self.audit('delete', row_identity(model), values)
+        return deleted
+
+    def get_bulk_pk(self):
+        """ The primary key column, or None if it's a composite key,
+            which bulk updates & deletes don't support. """
+        primary_key = inspect(self.model).primary_key
+        return primary_key[0] if len(primary_key) == 1 else None
+
+    def get_bulk_columns(self, form_class):
+        """ Fields of `form_class` which are the model's own columns
+            (not e.g. relationships), mapped to those columns' names. """
+        return {attr.key: attr.columns[0].key
+                for attr in inspect(self.model).column_attrs
+                if hasattr(form_class, attr.key)}
+
+    def before_bulk_write(self, rows):
+        """ Hook for adjusting validated rows (pairs of line number &
+            column values) before they're written, e.g. to hash passwords.
+            Bulk writes don't go through `on_model_change`. """
+        return rows
+
+    def after_bulk_write(self):
+        """ Hook called once rows were imported or deleted in bulk,
+            which doesn't go through `on_model_change` or
+            `after_model_delete`. """
+
+    def audit_bulk_write(self, action, rows, errors):
+        """ Audit each of `rows` (pairs of line number, or id, & column
+            values) which was written, i.e. isn't among `errors`. Bulk
+            writes don't load rows, so values before aren't known. """
+        if self.audit_log is None:
+            return
+        failed = {line_num for line_num, _ in errors}
+        redacted = self.audit_redacted_columns
+        for line_num, params in rows:
+            if line_num in failed:
+                continue
+            params = dict(params)
+            row_id = params.pop(PK_PARAM, None)
+            self.audit(action, row_id, {
+                key: [None, REDACTED if key in redacted else value]
+                for key, value in params.items()} or None)
+
+    @contextmanager
+    def bulk_session(self):
+        """ A session of its own for a bulk write, which commits a
+            chunk at a time, so that it doesn't also commit whatever
+            else is pending in the request's session. """
+        session = self.session.session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def import_rows(self, stream, import_format, mode):
+        """ Validate each row of the file in `stream` against the form
+            the user would have filled in, then insert them, or update
+            them by primary key. Returns a `BulkResult`. """
+        update = mode == 'update'
+        form_class = self._edit_form_class if update \
+            else self._create_form_class
+        columns = self.get_bulk_columns(form_class)
+        mapper = inspect(self.model)
+        pk = self.get_bulk_pk()
+        relationships = set(mapper.relationships.keys())
+
+        rows, errors = [], []
+        for line_num, row, error in read_rows(stream, import_format):
+            if error is None and update:
+                row = dict(row)
+                key = row.pop(self._primary_key, None)
+                if key in (None, ''):
+                    error = f'Missing {self._primary_key}'
+                elif not row:
+                    error = 'Nothing to update'
+            if error is None and relationships.intersection(row):
+                # Their rows can't be written with the model's own
+                error = "Relationships can't be imported: " + \
+                    ', '.join(sorted(relationships.intersection(row)))
+            if error is None:
+                params, error = validate_row(
+                    form_class, row, columns, partial=update)
+            if error is not None:
+                errors.append((line_num, error))
+                continue
+            if update:
+                params[PK_PARAM] = coerce_pk(pk, key)
+            rows.append((line_num, params))
+
+        rows = self.before_bulk_write(rows)
+        statements = update_statements(mapper, pk) if update \
+            else insert_statements(mapper)
+        with self.bulk_session() as session:
+            written, write_errors = write_rows(
+                session, statements, rows, self.bulk_chunk_size, mapper,
+                self._primary_key if update else None)
+        if written:
+            self.after_bulk_write()
+            self.audit_bulk_write(mode, rows, write_errors)
+        return BulkResult(written, sorted(errors + write_errors))
+
+    @expose('/import/', methods=('GET', 'POST'))
+    def bulk_import_view(self):
+        """ Insert or update rows from an uploaded CSV or JSON lines
+            file, `bulk_chunk_size` rows at a time. Rows which fail to
+            validate or to write are reported by line number, without
+            holding up the rest. """
+        if not self.can_bulk_edit:
+            abort(404)
+        modes = [mode for mode, allowed in (
+            ('insert', self.can_create),
+            ('update', self.can_edit and self.get_bulk_pk() is not None),
+        ) if allowed]
+        if not modes:
+            abort(403)
+        return_url = get_redirect_target() or self.get_url('.index_view')
+
+        result = None
+        if request.method == 'POST':
+            upload = request.files.get('file')
+            import_format = request.form.get('format')
+            mode = request.form.get('mode')
+            if not upload or import_format not in IMPORT_FORMATS or \
+                    mode not in modes:
+                flash('Choose a file, its format, and whether to '
+                      'insert or update rows.', 'error')
+            else:
+                with timed_phase('import'):
+                    result = self.import_rows(
+                        upload.stream, import_format, mode)
+
+        return self.render(self.bulk_import_template, result=result,
+                           modes=modes, formats=IMPORT_FORMATS,
+                           return_url=return_url)
+
+    def is_action_allowed(self, name):
+        if name == 'bulk_delete' and not (
+                self.can_bulk_edit and self.can_delete and
+                self.get_bulk_pk() is not None):
+            return False
+        return super(SecureModelView, self).is_action_allowed(name)
+
+    @action('bulk_delete', lazy_gettext('Delete in bulk'),
+            lazy_gettext('Are you sure you want to delete selected records?'))
+    def action_bulk_delete(self, ids):
+        """ Delete the selected rows with one statement per chunk,
+            rather than loading & deleting them one at a time. """
+        mapper = inspect(self.model)
+        pk = self.get_bulk_pk()
+        rows = [(id, {PK_PARAM: coerce_pk(pk, id)}) for id in ids]
+        with self.bulk_session() as session:
+            deleted, errors = write_rows(
+                session, delete_statements(mapper, pk), rows,
+                self.bulk_chunk_size, mapper, self._primary_key)
+        if deleted:
+            self.after_bulk_write()
+            self.audit_bulk_write('delete', rows, errors)
+            flash(f'{deleted} record(s) were successfully deleted.',
+                  'success')
+        for id, error in errors:
+            flash(f'Failed to delete record {id}: {error}', 'error')
+
+    def get_change_marker_tables(self):
+        """ Names of the tables whose changes could show up
+            in this view: its own, and those it's related to. """
+        mapper = inspect(self.model)
+        tables = {mapper.local_table.name}
+        for relationship in mapper.relationships:
+            tables.add(relationship.target.name)
+            if relationship.secondary is not None:
+                tables.add(relationship.secondary.name)
+        return sorted(tables)
+
+    def get_change_marker(self):
+        """ Something which changes whenever the view's data does.
+            Read from the same session as the page would be, so that
+            it's as up to date as the page (e.g. on a replica). """
+        session = self.query_session()
+        versions = get_table_versions(
+            session, self.get_change_marker_tables(), inspect(self.model))
+        if not self.change_marker_column:
+            return versions
+        # The count notices deletes, which the greatest value may not
+        column = getattr(self.model, self.change_marker_column)
+        latest, count = session.query(func.max(column), func.count()) \
+            .select_from(self.model).one()
+        return latest, count, versions
+
+    def table_changed(self):
+        """ Hook called after a request which may have changed the
+            view's table. """
+        mapper = inspect(self.model)
+        bump_table_version(self.session, mapper.local_table.name, mapper)
+
+    def get_etag(self, view_name, change_marker):
+        """ Everything the page depends on, but the data itself:
+            the query, who's asking (the menu depends on all of their
+            roles, and e.g. the users list on who they are), and the
+            change marker standing in for the data. """
+        return make_etag(
+            self.endpoint, view_name,
+            sorted(request.args.items(multi=True)),
+            sorted(current_role_names()), current_user.get_id(),
+            change_marker)
+
+    def _run_view(self, fn, *args, **kwargs):
+        run_view = super(SecureModelView, self)._run_view
+        if request.method not in ('GET', 'HEAD'):
+            if not (self.conditional_caching or self.track_changes):
+                return run_view(fn, *args, **kwargs)
+            # Anything but a read may have written to the table
+            response = run_view(fn, *args, **kwargs)
+            self.table_changed()
+            return response
+
+        if not self.conditional_caching:
+            return run_view(fn, *args, **kwargs)
+
+        # A page with messages to flash isn't the same page
+        if fn.__name__ not in CONDITIONAL_VIEWS or \
+                cookie_session.get('_flashes'):
+            return run_view(fn, *args, **kwargs)
+
+        with timed_phase('etag'):
+            change_marker = self.get_change_marker()
+            etag = self.get_etag(fn.__name__, change_marker)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(run_view(fn, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        # Let browsers keep the page, but always check it's current
+        response.headers['Cache-Control'] = 'private, no-cache'
+        if self.change_marker_column and \
+                isinstance(change_marker[0], datetime):
+            response.last_modified = change_marker[0]
+        return response
+
     def rebuild_views_respecting_access(self):
-        # Rebuild edit & list views based on who is accessing them
-        self._refresh_forms_cache()
-        self._list_columns = self.get_list_columns()
+        # Make sure edit & list views exist for whoever is accessing them
+        self.get_role_views()
 
     def has_one_accepted_role(self, user):
-        return any(
-            [current_user.has_role(r)
-             for r in self.roles_accepted])
+        return not current_role_names().isdisjoint(self.roles_accepted)
 
     def is_accessible(self):
+        """ Decided at most once per request for each view, since
+            rendering the menu asks every view in the admin. """
+        decisions = g.setdefault('secure_admin_access', {})
+        if self.endpoint not in decisions:
+            with timed_phase('access'):
+                decisions[self.endpoint] = self.check_access()
+        return decisions[self.endpoint]
+
+    def is_current_user(self, model):
+        """ Whether `model` is the logged in user, comparing tables & keys
+            rather than objects, which may come from different sessions. """
+        user = inspect(current_user._get_current_object(), raiseerr=False)
+        state = inspect(model, raiseerr=False)
+        if user is None or state is None or user.identity is None:
+            return False
+        return (user.mapper.local_table is state.mapper.local_table and
+                user.identity == state.identity)
+
+    def render(self, template, **kwargs):
+        with timed_phase('render'):
+            return super(SecureModelView, self).render(template, **kwargs)
+
+    def check_access(self):
         if (current_user.is_active and
                 current_user.is_authenticated and
                 self.has_one_accepted_role(current_user)):
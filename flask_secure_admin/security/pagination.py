@@ -0,0 +1,103 @@
+
+import hashlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from itsdangerous import BadData, URLSafeSerializer
+from sqlalchemy import and_, or_, text, inspect
+
+POSTGRES_ESTIMATE_QUERY = text(
+    'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)')
+
+
+def estimated_row_count(session, model):
+    """ The planner's estimate of how many rows `model`'s table has,
+        which costs a catalog lookup instead of a full scan.
+        Returns None where no estimate is available. """
+    mapper = inspect(model)
+    if session.get_bind(mapper=mapper).dialect.name != 'postgresql':
+        return None
+    estimate = session.execute(
+        POSTGRES_ESTIMATE_QUERY, dict(name=mapper.local_table.fullname),
+        mapper=mapper).scalar()
+    # Never analyzed tables report 0 (or -1, on newer Postgres)
+    return estimate if estimate and estimate > 0 else None
+
+
+def keyset_condition(columns, values, descending=False):
+    """ Rows which come after `values` when ordering by `columns`,
+        e.g. (a > 1) OR (a = 1 AND b > 2) for columns (a, b).
+        Written out rather than as a row-value comparison, which
+        not every database supports. """
+    column, *other_columns = columns
+    value, *other_values = values
+    after = column < value if descending else column > value
+    if not other_columns:
+        return after
+    return or_(after, and_(column == value, keyset_condition(
+        other_columns, other_values, descending)))
+
+
+# Salt for signing the seek keys in pager links, so that one can't be
+# forged, or mistaken for anything else signed with the secret key
+KEYSET_SALT = 'secure-admin-keyset'
+
+# Sort values which JSON can't hold, written into seek keys as
+# [tag, string] and read back with the parser
+KEYSET_VALUE_TYPES = (
+    ('datetime', datetime, datetime.fromisoformat),
+    ('date', date, date.fromisoformat),
+    ('time', time, time.fromisoformat),
+    ('decimal', Decimal, Decimal),
+    ('uuid', UUID, UUID),
+)
+
+
+def _dump_value(value):
+    for tag, value_type, _ in KEYSET_VALUE_TYPES:
+        if isinstance(value, value_type):
+            return [tag, value.isoformat() if hasattr(value, 'isoformat')
+                    else str(value)]
+    return value
+
+
+def _load_value(value):
+    if not isinstance(value, list):
+        return value
+    tag, text_value = value
+    parse = {tag: parse for tag, _, parse in KEYSET_VALUE_TYPES}[tag]
+    return parse(text_value)
+
+
+def keyset_context(*parts):
+    """ A short digest of what a seek key is only valid for,
+        e.g. the sort, search & filters of the list it came from. """
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def dump_keyset(secret_key, context, page, values):
+    """ A signed, URL-safe seek key saying that `page` starts after
+        the row with `values`, or None if a value can't be written. """
+    try:
+        return URLSafeSerializer(secret_key, salt=KEYSET_SALT).dumps(
+            [context, page, [_dump_value(value) for value in values]])
+    except (TypeError, ValueError):
+        return None
+
+
+def load_keyset(secret_key, token, context, page, length):
+    """ The values from a seek key made by `dump_keyset`, if it's
+        genuine and was made for `page` of the same list (`context`);
+        otherwise None, and the page is found with OFFSET instead. """
+    if not token:
+        return None
+    try:
+        token_context, token_page, values = URLSafeSerializer(
+            secret_key, salt=KEYSET_SALT).loads(token)
+        if token_context != context or token_page != page or \
+                len(values) != length:
+            return None
+        return tuple(_load_value(value) for value in values)
+    except (BadData, TypeError, ValueError, KeyError):
+        return None
@@ -5,17 +5,23 @@ from flask_security import current_user
 from flask_admin.contrib.sqla.form import get_form as get_sqla_form
 
 
+def hidden_role_only_columns(view):
+    """ The `role_only_columns` of `view` which
+        the current user isn't allowed to see. """
+    role_only_columns = view.role_only_columns or dict()
+    if current_user and not current_user.has_role(SUPER_ROLE):
+        return list(role_only_columns.get(SUPER_ROLE) or [])
+    return []
+
+
 def scaffold_list_columns_respecting_roles(self):
     """ Respect a new view option, `role_only_columns`,
         in the list view. Must be a dictionary mapping
         between role names and columns which only users
         with this role are allowed to see. """
     columns = SQLAModelView.scaffold_list_columns(self)
-    role_only_columns = self.role_only_columns or dict()
-    super_only_columns = role_only_columns.get(SUPER_ROLE) or []
-    if current_user and not current_user.has_role(SUPER_ROLE):
-        columns = [c for c in columns if c not in super_only_columns]
-    return columns
+    hidden_columns = hidden_role_only_columns(self)
+    return [c for c in columns if c not in hidden_columns]
 
 
 def scaffold_form_respecting_roles(self):
@@ -23,10 +29,7 @@ def scaffold_form_respecting_roles(self):
         except that we exclude `role_only_columns`
         if user does not have the expected role. """
     exclude = list(self.form_excluded_columns or [])
-    role_only_columns = self.role_only_columns or dict()
-    super_only_columns = role_only_columns.get(SUPER_ROLE) or []
-    if current_user and not current_user.has_role(SUPER_ROLE):
-        exclude.extend(role_only_columns[SUPER_ROLE])
+    exclude.extend(hidden_role_only_columns(self))
     converter = self.model_form_converter(self.session, self)
     form_class = get_sqla_form(self.model, converter,
                                base_class=self.form_base_class,
@@ -0,0 +1,208 @@
+
+import operator, re
+from functools import reduce
+
+from sqlalchemy import (MetaData, Table, Column, Integer, Float, Text,
+                        and_, or_, cast, column, func, literal_column, text,
+                        inspect)
+
+# Text search configurations are interpolated into SQL, so keep them simple
+CONFIG_PATTERN = re.compile(r'^\w+$')
+
+# Whether an index is valid (NULL if there's no such index); one left by
+# an interrupted CREATE INDEX CONCURRENTLY is there, but invalid
+POSTGRES_INDEX_VALID_QUERY = text(
+    'SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)')
+POSTGRES_TRY_LOCK_QUERY = text('SELECT pg_try_advisory_lock(hashtext(:key))')
+POSTGRES_UNLOCK_QUERY = text('SELECT pg_advisory_unlock(hashtext(:key))')
+
+
+class FullTextSearch(object):
+
+    """ Searches `columns` (names of columns of `model`'s table) for
+        whole words, using an index kept up to date by the database,
+        rather than scanning the table with ILIKE. Each search names
+        the columns it may look in, which are those the current user
+        is allowed to see. """
+
+    def __init__(self, model, columns, config='english'):
+        self.mapper = inspect(model)
+        self.table = self.mapper.local_table
+        self.pk = self.mapper.primary_key[0]
+        self.columns = list(columns)
+        if not CONFIG_PATTERN.match(config):
+            raise ValueError(f'Invalid text search configuration: {config}')
+        self.config = config
+
+    def create_index(self, bind):
+        """ Create the index, if it doesn't exist yet. """
+        raise NotImplementedError
+
+    def apply(self, query, count_query, terms, columns):
+        """ Filter `query` & `count_query` to rows with each of
+            `terms` in one of `columns`. """
+        raise NotImplementedError
+
+    def rank(self, terms, columns):
+        """ An expression to order the filtered `query` by, best
+            matches first, or None if there's no ranking. """
+        return None
+
+
+class PostgresFullTextSearch(FullTextSearch):
+
+    """ A GIN index on the `tsvector` of each column, so a search can
+        use the indexes of just the columns it's allowed to look in. """
+
+    def tsvector(self, column):
+        """ `column`'s words; the index is on exactly this expression,
+            so that searches can use it. """
+        return func.to_tsvector(
+            literal_column(f"'{self.config}'::regconfig"),
+            func.coalesce(cast(column, Text), ''))
+
+    def tsquery(self, terms):
+        return func.plainto_tsquery(
+            literal_column(f"'{self.config}'::regconfig"), ' '.join(terms))
+
+    def create_index(self, bind):
+        """ Built CONCURRENTLY, so writes to the table carry on while
+            it builds, and only by whichever worker gets the advisory
+            lock; the others start up without it, and their searches
+            work in the meantime, just without the index. """
+        preparer = bind.dialect.identifier_preparer
+        table = preparer.format_table(self.table)
+        schema = f'{preparer.quote_schema(self.table.schema)}.' \
+            if self.table.schema else ''
+        lock_key = f'secure_admin_fts:{self.table.fullname}'
+        # CONCURRENTLY can't run inside a transaction
+        with bind.connect() as connection:
+            connection = connection.execution_options(
+                isolation_level='AUTOCOMMIT')
+            if not connection.execute(
+                    POSTGRES_TRY_LOCK_QUERY, key=lock_key).scalar():
+                return
+            try:
+                for name in self.columns:
+                    index = preparer.quote(
+                        f'{self.table.name}_{name}_fts_idx')
+                    valid = connection.execute(
+                        POSTGRES_INDEX_VALID_QUERY,
+                        name=f'{schema}{index}').scalar()
+                    if valid:
+                        continue
+                    if valid is not None:
+                        connection.execute(text(
+                            f'DROP INDEX CONCURRENTLY IF EXISTS '
+                            f'{schema}{index}'))
+                    expression = self.tsvector(column(name)).compile(
+                        dialect=bind.dialect,
+                        compile_kwargs=dict(literal_binds=True))
+                    connection.execute(text(
+                        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} '
+                        f'ON {table} USING gin ({expression})'))
+            finally:
+                connection.execute(POSTGRES_UNLOCK_QUERY, key=lock_key)
+
+    def apply(self, query, count_query, terms, columns):
+        # Like flask-admin's search, every term must match
+        # some column, though not necessarily the same one
+        condition = and_(*(or_(*(
+            self.tsvector(self.table.c[name]).op('@@')(self.tsquery([term]))
+            for name in columns)) for term in terms))
+        query = query.filter(condition)
+        if count_query is not None:
+            count_query = count_query.filter(condition)
+        return query, count_query
+
+    def rank(self, terms, columns):
+        tsquery = self.tsquery(terms)
+        return reduce(operator.add, (
+            func.ts_rank(self.tsvector(self.table.c[name]), tsquery)
+            for name in columns)).desc()
+
+
+class SQLiteFullTextSearch(FullTextSearch):
+
+    """ An FTS5 table indexing the searchable columns, with triggers
+        to keep it in step with the table. A column filter restricts
+        each search to the columns it's allowed to look in. """
+
+    def __init__(self, *args, **kwargs):
+        super(SQLiteFullTextSearch, self).__init__(*args, **kwargs)
+        self.index_name = f'{self.table.name}_fts'
+        self.index_table = Table(
+            self.index_name, MetaData(),
+            Column('rowid', Integer), Column('rank', Float))
+
+    def create_index(self, bind):
+        name, table, pk = self.index_name, self.table.name, self.pk.name
+        columns = ', '.join(self.columns)
+        new_columns = ', '.join(f'new.{c}' for c in self.columns)
+        old_columns = ', '.join(f'old.{c}' for c in self.columns)
+        with bind.begin() as connection:
+            existing = [row[1] for row in connection.execute(
+                text(f'PRAGMA table_info({name})'))]
+            if existing == self.columns:
+                return
+            if existing:
+                # The searchable columns changed
+                connection.execute(text(f'DROP TABLE {name}'))
+            connection.execute(text(
+                f'CREATE VIRTUAL TABLE {name} USING fts5({columns}, '
+                f"content='{table}', content_rowid='{pk}')"))
+            for trigger in ('ai', 'ad', 'au'):
+                connection.execute(text(
+                    f'DROP TRIGGER IF EXISTS {name}_{trigger}'))
+            connection.execute(text(
+                f'CREATE TRIGGER {name}_ai AFTER INSERT ON {table} BEGIN '
+                f'INSERT INTO {name} (rowid, {columns}) '
+                f'VALUES (new.{pk}, {new_columns}); END'))
+            connection.execute(text(
+                f'CREATE TRIGGER {name}_ad AFTER DELETE ON {table} BEGIN '
+                f'INSERT INTO {name} ({name}, rowid, {columns}) '
+                f"VALUES ('delete', old.{pk}, {old_columns}); END"))
+            connection.execute(text(
+                f'CREATE TRIGGER {name}_au AFTER UPDATE ON {table} BEGIN '
+                f'INSERT INTO {name} ({name}, rowid, {columns}) '
+                f"VALUES ('delete', old.{pk}, {old_columns}); "
+                f'INSERT INTO {name} (rowid, {columns}) '
+                f'VALUES (new.{pk}, {new_columns}); END'))
+            connection.execute(text(
+                f"INSERT INTO {name} ({name}) VALUES ('rebuild')"))
+
+    def match(self, terms, columns):
+        # Quote each term, so none of them is taken for FTS5 syntax
+        phrases = ' '.join('"{}"'.format(term.replace('"', '""'))
+                           for term in terms)
+        return literal_column(self.index_name).op('MATCH')(
+            f"{{{' '.join(columns)}}} : ({phrases})")
+
+    def apply(self, query, count_query, terms, columns):
+        match = self.match(terms, columns)
+        # Joined, so results can be ordered by the index's rank
+        query = query.join(self.index_table,
+                           self.index_table.c.rowid == self.pk).filter(match)
+        if count_query is not None:
+            count_query = count_query.filter(self.pk.in_(
+                self.index_table.select().with_only_columns(
+                    [self.index_table.c.rowid]).where(match)))
+        return query, count_query
+
+    def rank(self, terms, columns):
+        # bm25, where lower is better
+        return self.index_table.c.rank
+
+
+FULL_TEXT_SEARCH_BACKENDS = dict(
+    postgresql=PostgresFullTextSearch,
+    sqlite=SQLiteFullTextSearch,
+)
+
+
+def full_text_search_for(session, model, columns, config='english'):
+    """ The `FullTextSearch` for the database `model` is in, or
+        None if full-text search isn't supported there. """
+    bind = session.get_bind(mapper=inspect(model))
+    backend = FULL_TEXT_SEARCH_BACKENDS.get(bind.dialect.name)
+    return backend(model, columns, config) if backend else None
@@ -1,42 +1,105 @@
 
-from jinja2 import Environment, PackageLoader, ChoiceLoader, select_autoescape
+from jinja2 import (Environment, PackageLoader, ChoiceLoader,
+                    FileSystemBytecodeCache, select_autoescape)
+from markupsafe import Markup
+
+MASTER_TEMPLATE_NAME = 'admin/master.html'
 
 def get_loader():
     return PackageLoader('flask_secure_admin', 'templates')
 
-def load_master_template(app):
+def enable_bytecode_cache(app, directory):
     """
-        Put a template object in the app's jinja environment
-        called `secure_admin_master_template`, which points
-        to secure_admin's 'master.html' template, a drop-in
-        replacement for flask_admin's template of the same name.
+        Keep compiled templates in `directory`, so that a fresh
+        worker process loads their bytecode instead of compiling
+        them again from source. Jinja still checks each template's
+        source for changes, so auto-reload keeps working.
+    """
+    if app.jinja_env.bytecode_cache is None:
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    return app.jinja_env.bytecode_cache
 
-        The whole reason for loading it directly into the
-        jinja environment is that we want it to be able to
-        be extended by users of this library, but typically
-        that's not possible because it needs to be in a file
-        of the same name in order for flask_admin to see it.
+def precompile_templates(app):
+    """
+        Load every one of secure_admin's templates into the app's
+        jinja environment ahead of the first request that needs it,
+        filling the bytecode cache if there is one.
     """
+    for name in get_loader().list_templates():
+        if name.endswith('.html'):
+            app.jinja_env.get_template(name)
+
+def enable_menu_cache(app, cache, key):
+    """
+        Let master.html reuse menus it rendered before, from
+        `cache`, for as long as `key(admin_view)` is the same,
+        instead of asking every view whether to show it again.
+    """
+    def cached_menu(render, admin_view):
+        cache_key = key(admin_view)
+        menu = cache.get(cache_key)
+        if menu is None:
+            menu = Markup(render())
+            cache.set(cache_key, menu)
+        return menu
+
+    app.jinja_env.globals['secure_admin_cached_menu'] = cached_menu
 
+def compile_master_template(app_env):
     secure_admin_loader = get_loader()
     secure_admin_env = Environment(
         loader=secure_admin_loader,
         autoescape=select_autoescape(['html'])
     )
-    app_env = app.jinja_env
 
     # Cherry-pick the underlying template source
     # from the "secure_admin" environment
     source, filename, uptodate = \
-        secure_admin_loader.get_source(secure_admin_env, 'admin/master.html')
+        secure_admin_loader.get_source(secure_admin_env, MASTER_TEMPLATE_NAME)
 
     # Compile the underlying template source inside the app's environment
-    # (NOT the environment from which it originated!)
-    # I suspect strongly that this breaks jinja's helpful feature
-    # which allows templates to be updated without restarting the app, FYI
-    code = app_env.compile(source, 'master.html', filename)
-    master_template = app_env.template_class.from_code(
-        app_env, code, {}, uptodate)
+    # (NOT the environment from which it originated!),
+    # going through its bytecode cache like jinja's loaders do
+    bytecode_cache = app_env.bytecode_cache
+    code = bucket = None
+    if bytecode_cache is not None:
+        bucket = bytecode_cache.get_bucket(
+            app_env, 'master.html', filename, source)
+        code = bucket.code
+    if code is None:
+        code = app_env.compile(source, 'master.html', filename)
+        if bucket is not None:
+            bucket.code = code
+            bytecode_cache.set_bucket(bucket)
+    return app_env.template_class.from_code(app_env, code, {}, uptodate)
+
+def load_master_template(app):
+    """
+        Put a template object in the app's jinja environment
+        called `secure_admin_master_template`, which points
+        to secure_admin's 'master.html' template, a drop-in
+        replacement for flask_admin's template of the same name.
+
+        The whole reason for loading it directly into the
+        jinja environment is that we want it to be able to
+        be extended by users of this library, but typically
+        that's not possible because it needs to be in a file
+        of the same name in order for flask_admin to see it.
+    """
+    app_env = app.jinja_env
 
     # Put the template where we can use it
-    app_env.globals['secure_admin_master_template'] = master_template
+    app_env.globals['secure_admin_master_template'] = \
+        compile_master_template(app_env)
+
+    @app.context_processor
+    def reload_master_template():
+        """ Jinja doesn't know to auto-reload a template global,
+            so do it here whenever the app asks for auto-reload. """
+        if not app_env.auto_reload:
+            return dict()
+        master_template = app_env.globals['secure_admin_master_template']
+        if not master_template.is_up_to_date:
+            master_template = compile_master_template(app_env)
+            app_env.globals['secure_admin_master_template'] = master_template
+        return dict(secure_admin_master_template=master_template)
@@ -1,18 +1,15 @@
-
 from flask_security.utils import encrypt_password
 from datetime import datetime
 
 def create_initial_admin_user(app):
     with app.app_context():
-        user = app.db.users.insert(**dict(
-            id=1, email='admin@example.com',
+        # Go through the datastore, so this works with any model backend
+        datastore = app.extensions['security'].datastore
+        role = datastore.create_role(
+            name='superuser', description='Someone who can do anything')
+        user = datastore.create_user(
+            email='admin@example.com',
             password=encrypt_password('password'),
-            active=True, confirmed_at=datetime.utcnow()))
-        role = app.db.roles.insert(**dict(
-            id=1, name='superuser', description='Someone who can do anything'
-        ))
-        app.db.commit()
-        app.db.users_roles.insert(**dict(
-            id=1, role_id=1, user_id=1
-        ))
-        app.db.commit()
+            active=True, confirmed_at=datetime.utcnow())
+        datastore.add_role_to_user(user, role)
+        datastore.commit()
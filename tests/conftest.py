@@ -0,0 +1,85 @@
+
+import os, sqlite3
+
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('SECURITY_PASSWORD_SALT', 'test')
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlsoup import SQLSoup
+
+from flask_secure_admin import SecureAdminBlueprint
+from flask_secure_admin.utils import encrypt_password
+
+PASSWORD = 'password'
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """ Builds an app over a fresh SQLite database holding `schema`,
+        with the blueprint registered on it, the initial superuser
+        it creates, and an 'operator' with no other role. `relate`
+        is called with the SQLSoup db before the blueprint is. """
+
+    def make_app(schema='', relate=None, config=None,
+                 blueprint_class=SecureAdminBlueprint, **options):
+        path = tmp_path / 'test.db'
+        with sqlite3.connect(str(path)) as connection:
+            connection.executescript(schema)
+        app = Flask('test')
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config.update(config or {})
+        app.db = SQLSoup(f'sqlite:///{path}')
+        if relate is not None:
+            from flask_secure_admin.bootstrap import bootstrap_schema
+            bootstrap_schema(app.db.bind)
+            relate(app.db)
+        options.setdefault('name', 'Test')
+        app.register_blueprint(blueprint_class(**options))
+        with app.app_context():
+            app.db.roles.insert(id=2, name='operator')
+            app.db.users.insert(id=2, email='operator@example.com',
+                                active=True,
+                                password=encrypt_password(PASSWORD))
+            app.db.users_roles.insert(id=2, user_id=2, role_id=2)
+            app.db.commit()
+        return app
+
+    return make_app
+
+
+@pytest.fixture
+def login():
+    """ Returns a test client for the app, logged in as `email`. """
+
+    def login(app, email, password=PASSWORD):
+        client = app.test_client()
+        response = client.post(
+            '/login', data=dict(email=email, password=password))
+        assert response.status_code == 302, response.data
+        return client
+
+    return login
+
+
+
+@pytest.fixture
+def queries():
+    """ Returns a function which records the statements run on an
+        app's database from then on, in the list it returns. """
+    listeners = []
+
+    def queries(app):
+        statements = []
+
+        def record(connection, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(app.db.bind, 'before_cursor_execute', record)
+        listeners.append((app.db.bind, record))
+        return statements
+
+    yield queries
+    for bind, record in listeners:
+        event.remove(bind, 'before_cursor_execute', record)
@@ -0,0 +1,110 @@
+
+import io, json
+from threading import Event
+
+import pytest
+
+from flask_secure_admin.audit import AuditLog, REDACTED
+
+SCHEMA = '''
+create table widgets (id integer primary key, name varchar(80));
+insert into widgets (name) values ('gadget');
+'''
+
+
+@pytest.fixture
+def audit_path(tmp_path):
+    return tmp_path / 'audit.jsonl'
+
+
+@pytest.fixture
+def app(make_app, audit_path):
+    return make_app(SCHEMA, models=['widgets'], audit_log_path=str(audit_path),
+                    users_bulk_import=True, view_options=[dict(
+                        can_bulk_edit=True)])
+
+
+def entries(app, audit_path):
+    app.blueprints['secure_admin'].audit_log.flush()
+    with open(audit_path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_changes_through_the_views_are_logged(app, login, audit_path):
+    client = login(app, 'admin@example.com')
+    client.post('/admin/widgets/new/', data=dict(name='gizmo'))
+    client.post('/admin/widgets/edit/?id=1', data=dict(name='gadgets'))
+    client.post('/admin/widgets/delete/', data=dict(id='2'))
+
+    created, updated, deleted = entries(app, audit_path)
+    assert {entry['actor'] for entry in (created, updated, deleted)} == \
+        {'admin@example.com'}
+    assert (created['action'], created['row_id'], created['changes']) == \
+        ('create', 2, dict(name=[None, 'gizmo']))
+    assert (updated['action'], updated['row_id'], updated['changes']) == \
+        ('update', 1, dict(name=['gadget', 'gadgets']))
+    assert (deleted['action'], deleted['row_id'], deleted['changes']) == \
+        ('delete', 2, dict(id=[2, None], name=['gizmo', None]))
+    assert created['view'] == 'widgets' and created['table'] == 'widgets'
+    assert app.blueprints['secure_admin'].audit_log.stats()['written'] == 3
+
+
+def test_passwords_are_redacted_and_roles_listed(app, login, audit_path):
+    client = login(app, 'admin@example.com')
+    client.post('/admin/users/new/', data=dict(
+        email='new@example.com', password='secret', active='y',
+        roles=['2']))
+
+    created, = entries(app, audit_path)
+    assert created['changes']['password'] == [None, REDACTED]
+    assert created['changes']['roles'] == dict(added=[2], removed=[])
+    assert 'secret' not in json.dumps(created)
+
+
+def test_bulk_writes_are_logged(app, login, audit_path):
+    client = login(app, 'admin@example.com')
+    client.post('/admin/users/import/', data=dict(
+        file=(io.BytesIO(b'email,password\nbulk@example.com,secret\n'),
+              'users.csv'), format='csv', mode='insert'))
+    client.post('/admin/widgets/action/', data=dict(
+        action='bulk_delete', rowid=['1', '999']))
+
+    imported, deleted = entries(app, audit_path)
+    assert (imported['view'], imported['action']) == ('users', 'insert')
+    assert imported['changes']['email'] == [None, 'bulk@example.com']
+    assert imported['changes']['password'] == [None, REDACTED]
+    # Only the row which was actually deleted
+    assert (deleted['view'], deleted['action'], deleted['row_id']) == \
+        ('widgets', 'delete', 1)
+
+
+def test_entries_can_go_to_a_table(make_app, login):
+    app = make_app(SCHEMA, models=['widgets'], view_options=[{}],
+                   audit_log_table=True)
+    client = login(app, 'admin@example.com')
+    client.post('/admin/widgets/edit/?id=1', data=dict(name='gadgets'))
+    app.blueprints['secure_admin'].audit_log.flush()
+    with app.app_context():
+        row, = app.db.execute('select * from admin_audit_log').fetchall()
+    assert (row.actor, row.action, row.row_id) == \
+        ('admin@example.com', 'update', '1')
+    assert json.loads(row.changes) == dict(name=['gadget', 'gadgets'])
+
+
+def test_entries_are_dropped_when_the_queue_is_full():
+    writing, done = Event(), Event()
+
+    class SlowSink(object):
+        def write(self, entries):
+            writing.set()
+            done.wait()
+
+    audit_log = AuditLog(SlowSink(), maxsize=1, put_timeout=0)
+    audit_log.record('first')
+    writing.wait()
+    audit_log.record('queued')
+    audit_log.record('dropped')
+    assert audit_log.stats()['dropped'] == 1
+    done.set()
+    audit_log.close()
+    assert audit_log.stats()['written'] == 2
@@ -0,0 +1,47 @@
+
+import sqlite3
+
+from sqlalchemy import create_engine, inspect
+
+from flask_secure_admin.bootstrap import bootstrap_schema, users_exist
+
+INDEXES = {'users_roles_user_id_idx', 'users_roles_role_id_user_id_idx'}
+
+
+def index_names(bind, table_name):
+    return {index['name'] for index in inspect(bind).get_indexes(table_name)}
+
+
+def test_creates_the_auth_tables_and_indexes(tmp_path):
+    bind = create_engine(f'sqlite:///{tmp_path / "test.db"}')
+    bootstrap_schema(bind)
+    assert {'users', 'roles', 'users_roles'} <= \
+        set(inspect(bind).get_table_names())
+    assert index_names(bind, 'users_roles') == INDEXES
+    assert not users_exist(bind)
+
+    # Safe to run on every start
+    bind.execute("insert into users (email) values ('a@example.com')")
+    bootstrap_schema(bind)
+    assert users_exist(bind)
+
+
+def test_adds_missing_indexes_to_existing_tables(tmp_path):
+    path = tmp_path / 'test.db'
+    with sqlite3.connect(str(path)) as connection:
+        connection.executescript('''
+            create table users_roles (id integer primary key,
+                                      user_id integer not null,
+                                      role_id integer not null);
+            create index users_roles_user_id_idx on users_roles (user_id);
+        ''')
+    bind = create_engine(f'sqlite:///{path}')
+    bootstrap_schema(bind)
+    assert index_names(bind, 'users_roles') == INDEXES
+
+
+def test_registering_bootstraps_an_empty_database(make_app, login):
+    app = make_app()
+    assert {'users', 'roles', 'users_roles'} <= \
+        set(inspect(app.db.bind).get_table_names())
+    login(app, 'admin@example.com')
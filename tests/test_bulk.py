@@ -0,0 +1,83 @@
+
+import io
+
+import pytest
+
+SCHEMA = '''
+create table widgets (id integer primary key,
+                      name varchar(80) not null unique);
+insert into widgets (name) values ('one'), ('two'), ('three');
+'''
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SCHEMA, models=['widgets'], view_options=[dict(
+        can_bulk_edit=True, bulk_chunk_size=2)])
+
+
+def names(app):
+    with app.app_context():
+        return {w.id: w.name for w in app.db.widgets.all()}
+
+
+def upload(client, contents, mode, import_format='csv'):
+    response = client.post('/admin/widgets/import/', data=dict(
+        file=(io.BytesIO(contents.encode()), 'widgets.' + import_format),
+        format=import_format, mode=mode))
+    assert response.status_code == 200
+    return response.data.decode()
+
+
+def test_inserts(app, login):
+    client = login(app, 'admin@example.com')
+    page = upload(client, 'name\nfour\nfive\nsix\n', 'insert')
+    assert '3 row(s) written, 0 failed.' in page
+    assert set(names(app).values()) == {
+        'one', 'two', 'three', 'four', 'five', 'six'}
+
+
+def test_updates_by_primary_key(app, login):
+    client = login(app, 'admin@example.com')
+    page = upload(client, '{"id": 1, "name": "uno"}\n'
+                          '{"id": 3, "name": "tres"}\n', 'update', 'jsonl')
+    assert '2 row(s) written, 0 failed.' in page
+    assert names(app) == {1: 'uno', 2: 'two', 3: 'tres'}
+
+
+def test_a_bad_row_only_fails_itself(app, login):
+    client = login(app, 'admin@example.com')
+    # 'two' breaks the unique constraint halfway through the second chunk
+    page = upload(client, 'name\nfour\nfive\nsix\ntwo\nseven\n', 'insert')
+    assert '4 row(s) written, 1 failed.' in page
+    assert '<td>5</td><td>UNIQUE constraint failed' in page
+    assert set(names(app).values()) == {
+        'one', 'two', 'three', 'four', 'five', 'six', 'seven'}
+
+
+def test_updating_a_missing_key_fails(app, login):
+    client = login(app, 'admin@example.com')
+    page = upload(client, 'id,name\n1,uno\n999,nada\n3,tres\n', 'update')
+    assert '2 row(s) written, 1 failed.' in page
+    assert '<td>3</td><td>No row with id 999</td>' in page
+    assert names(app) == {1: 'uno', 2: 'two', 3: 'tres'}
+
+
+def test_relationships_cant_be_imported(make_app, login):
+    app = make_app(users_bulk_import=True)
+    client = login(app, 'admin@example.com')
+    response = client.post('/admin/users/import/', data=dict(
+        file=(io.BytesIO(b'email,password,roles\nnew@example.com,pw,x\n'),
+              'users.csv'), format='csv', mode='insert'))
+    assert "Relationships can&#39;t be imported: roles" in \
+        response.data.decode()
+
+
+def test_deletes(app, login):
+    client = login(app, 'admin@example.com')
+    response = client.post('/admin/widgets/action/', data=dict(
+        action='bulk_delete', rowid=['1', '3', '999']), follow_redirects=True)
+    page = response.data.decode()
+    assert '2 record(s) were successfully deleted.' in page
+    assert 'Failed to delete record 999: No row with id 999' in page
+    assert names(app) == {2: 'two'}
@@ -0,0 +1,97 @@
+
+import pytest
+from sqlalchemy import inspect
+
+SCHEMA = '''
+create table widgets (id integer primary key, name varchar(80),
+                      updated_at timestamp);
+create table tags (id integer primary key, name varchar(80));
+create table widgets_tags (id integer primary key,
+                           widget_id integer references widgets (id),
+                           tag_id integer references tags (id));
+insert into widgets (name, updated_at) values
+    ('one', '2024-01-01 00:00:00'), ('two', '2024-01-02 00:00:00');
+insert into tags (name) values ('red');
+insert into widgets_tags (widget_id, tag_id) values (1, 1);
+'''
+
+
+def relate(db):
+    db.widgets.relate('tags', db.tags, secondary=db.widgets_tags._table)
+
+
+def make_caching_app(make_app, **options):
+    return make_app(SCHEMA, relate=relate, models=['tags', 'widgets'],
+                    view_options=[{}, dict(conditional_caching=True,
+                                           **options)])
+
+
+@pytest.fixture
+def app(make_app):
+    return make_caching_app(make_app)
+
+
+def get(client, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get('/admin/widgets/', headers=headers)
+
+
+def test_unchanged_pages_are_not_modified(app, login, queries):
+    reader = login(app, 'admin@example.com')
+    response = get(reader)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    statements = queries(app)
+    response = get(reader, etag)
+    assert response.status_code == 304
+    assert not [s for s in statements if 'FROM widgets' in s]
+
+    writer = login(app, 'admin@example.com')
+    writer.post('/admin/widgets/edit/?id=1', data=dict(name='uno'))
+    response = get(reader, etag)
+    assert response.status_code == 200
+    assert b'uno' in response.data
+
+
+def test_edits_to_related_tables_change_the_page(app, login):
+    reader = login(app, 'admin@example.com')
+    etag = get(reader).headers['ETag']
+    # The tags view doesn't cache, but still counts its writes
+    writer = login(app, 'admin@example.com')
+    writer.post('/admin/tags/edit/?id=1', data=dict(name='blue'))
+    assert get(reader, etag).status_code == 200
+
+
+def test_deletes_change_the_page_with_a_change_marker_column(
+        make_app, login):
+    app = make_caching_app(make_app, change_marker_column='updated_at')
+    reader = login(app, 'admin@example.com')
+    response = get(reader)
+    etag = response.headers['ETag']
+    assert response.last_modified.year == 2024
+
+    # Not the latest row, so the greatest `updated_at` stays the same
+    writer = login(app, 'admin@example.com')
+    writer.post('/admin/widgets/delete/', data=dict(id='1'))
+    with app.app_context():
+        assert app.db.widgets.count() == 1
+    response = get(reader, etag)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    # Nor does it outside of the admin, but the row count does
+    with app.app_context():
+        app.db.execute('delete from widgets')
+        app.db.commit()
+    assert get(reader, etag).status_code == 200
+
+
+def test_versions_table_is_made_for_conditional_caching(app):
+    assert 'admin_table_versions' in inspect(app.db.bind).get_table_names()
+
+
+def test_versions_table_is_only_made_for_conditional_caching(make_app):
+    app = make_app(SCHEMA, models=['widgets'])
+    assert 'admin_table_versions' not in \
+        inspect(app.db.bind).get_table_names()
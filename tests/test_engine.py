@@ -0,0 +1,54 @@
+
+import sqlite3
+
+import pytest
+
+SCHEMA = 'create table widgets (id integer primary key, name varchar(80));'
+
+
+@pytest.fixture
+def replica(tmp_path):
+    """ A stand-in for a read replica, which has fallen behind:
+        its copy of the widget still has its old name. """
+    path = tmp_path / 'replica.db'
+    with sqlite3.connect(str(path)) as connection:
+        connection.executescript(SCHEMA + '''
+            insert into widgets (name) values ('on-replica');''')
+    return f'sqlite:///{path}'
+
+
+@pytest.fixture
+def app(make_app, replica):
+    primary = SCHEMA + "insert into widgets (name) values ('on-primary');"
+    return make_app(primary, models=['widgets'], read_only_bind=replica,
+                    engine_options=dict(pool_pre_ping=True),
+                    view_options=[dict(can_view_details=True)])
+
+
+def test_reads_go_to_the_read_only_bind(app, login):
+    client = login(app, 'admin@example.com')
+    assert b'on-replica' in client.get('/admin/widgets/').data
+    assert b'on-replica' in client.get('/admin/widgets/details/?id=1').data
+
+
+def test_writes_go_to_the_primary(app, login):
+    client = login(app, 'admin@example.com')
+    # Editing reads from the primary too, so it doesn't start from stale data
+    assert b'on-primary' in client.get('/admin/widgets/edit/?id=1').data
+    response = client.post('/admin/widgets/edit/?id=1',
+                           data=dict(name='edited'))
+    assert response.status_code == 302
+    with app.app_context():
+        assert app.db.widgets.get(1).name == 'edited'
+    assert b'edited' not in client.get('/admin/widgets/').data
+
+
+def test_logins_use_the_primary(app, login):
+    # The replica has no users table at all
+    login(app, 'operator@example.com')
+
+
+def test_engine_options_apply_to_both_engines(app):
+    blueprint = app.blueprints['secure_admin']
+    assert app.db.bind.pool._pre_ping
+    assert blueprint.read_session.get_bind().pool._pre_ping
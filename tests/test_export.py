@@ -0,0 +1,75 @@
+
+import csv, io, json
+
+import pytest
+
+from flask_secure_admin.utils import encrypt_password
+
+SCHEMA = '''
+create table tags (id integer primary key, name varchar(80));
+create table widgets (id integer primary key, name varchar(80),
+                      owner_id integer references users(id));
+create table widgets_tags (id integer primary key,
+                           widget_id integer references widgets(id),
+                           tag_id integer references tags(id));
+'''
+COLUMNS = ['name', 'owner', 'owner.email', 'tags']
+
+
+def relate(db):
+    db.widgets.relate('owner', db.users)
+    db.widgets.relate('tags', db.tags, secondary=db.widgets_tags._table)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(SCHEMA, relate=relate, models=['tags', 'widgets'],
+                   view_options=[{}, dict(can_export=True,
+                                          column_export_list=COLUMNS)])
+    db = app.db
+    with app.app_context():
+        for i in range(5):
+            db.users.insert(id=10 + i, email=f'user{i}@example.com',
+                            active=True, password=encrypt_password('password'))
+            db.tags.insert(id=i + 1, name=f'tag{i}')
+            db.widgets.insert(id=i + 1, name=f'widget{i}', owner_id=10 + i)
+            db.widgets_tags.insert(id=2 * i + 1, widget_id=i + 1, tag_id=i + 1)
+            db.widgets_tags.insert(id=2 * i + 2, widget_id=i + 1,
+                                   tag_id=(i + 1) % 5 + 1)
+        db.commit()
+    return app
+
+
+def csv_rows(data):
+    return list(csv.reader(io.StringIO(data.decode())))
+
+
+def test_jsonl_export_matches_csv(app, login):
+    client = login(app, 'admin@example.com')
+    streamed_csv = csv_rows(client.get('/admin/widgets/stream/csv/').data)
+    jsonl = client.get('/admin/widgets/stream/jsonl/').data.decode()
+    objects = [json.loads(line) for line in jsonl.splitlines()]
+
+    assert streamed_csv[0] == ['Name', 'Owner', 'Owner.Email', 'Tags']
+    assert len(objects) == len(streamed_csv) - 1 == 5
+    for values, obj in zip(streamed_csv[1:], objects):
+        assert list(obj) == COLUMNS
+        assert values == ['' if value is None else str(value)
+                          for value in obj.values()]
+    assert objects[0] == {'name': 'widget0', 'owner': 10,
+                          'owner.email': 'user0@example.com', 'tags': '1, 2'}
+
+
+def test_streamed_csv_matches_export(app, login):
+    client = login(app, 'admin@example.com')
+    exported = csv_rows(client.get('/admin/widgets/export/csv/').data)
+    streamed = csv_rows(client.get('/admin/widgets/stream/csv/').data)
+    assert streamed == exported
+
+
+def test_related_rows_are_not_exported_by_repr(app, login):
+    client = login(app, 'admin@example.com')
+    for url in ('/admin/widgets/stream/csv/', '/admin/widgets/stream/jsonl/',
+                '/admin/widgets/export/csv/'):
+        data = client.get(url).data
+        assert b'password' not in data and b'pbkdf2' not in data
@@ -0,0 +1,69 @@
+
+from types import SimpleNamespace
+
+import pytest
+
+from flask_secure_admin.instrumentation import _user_loader
+
+SCHEMA = '''
+create table widgets (id integer primary key, name varchar(80));
+insert into widgets (name) values ('gadget');
+'''
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(SCHEMA, models=['widgets'], instrumentation=True,
+                   metrics_token='scraper')
+    app.add_url_rule('/hello', 'hello', lambda: 'Hello')
+    return app
+
+
+def phases(response):
+    return {timing.split(';')[0] for timing in
+            response.headers.get('Server-Timing', '').split(', ') if timing}
+
+
+def test_admin_pages_are_timed(app, login):
+    response = login(app, 'admin@example.com').get('/admin/widgets/')
+    assert {'user', 'access', 'count', 'query', 'render', 'total'} <= \
+        phases(response)
+
+
+def test_the_rest_of_the_app_isnt_timed(app, login):
+    assert 'Server-Timing' not in app.test_client().get('/hello').headers
+    client = login(app, 'admin@example.com')
+    assert 'Server-Timing' not in client.get('/hello').headers
+
+    metrics = app.test_client().get('/admin/_metrics/', headers=dict(
+        Authorization='Bearer scraper')).data.decode()
+    assert 'view="widgets"' not in metrics
+    client.get('/admin/widgets/')
+    metrics = app.test_client().get('/admin/_metrics/', headers=dict(
+        Authorization='Bearer scraper')).data.decode()
+    assert 'view="widgets",phase="query"' in metrics
+    assert 'view="hello"' not in metrics
+
+
+def test_timings_arent_sent_to_anonymous_users(app):
+    response = app.test_client().get('/admin/widgets/')
+    assert response.status_code == 302
+    assert 'Server-Timing' not in response.headers
+
+
+def test_metrics_need_a_role_or_the_token(app, login):
+    client = app.test_client()
+    assert client.get('/admin/_metrics/', headers=dict(
+        Authorization='Bearer wrong')).status_code == 403
+    assert login(app, 'operator@example.com').get(
+        '/admin/_metrics/').status_code == 403
+    assert login(app, 'admin@example.com').get(
+        '/admin/_metrics/').status_code == 200
+
+
+@pytest.mark.parametrize('name', ['_user_callback', 'user_callback'])
+def test_user_loader_is_found_on_any_flask_login(name):
+    def load(id):
+        pass
+
+    assert _user_loader(SimpleNamespace(**{name: load})) is load
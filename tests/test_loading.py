@@ -0,0 +1,100 @@
+
+import pytest
+
+SCHEMA = '''
+create table widgets (id integer primary key, name varchar(80),
+                      owner_id integer references users (id));
+create table tags (id integer primary key, name varchar(80));
+create table widgets_tags (id integer primary key,
+                           widget_id integer references widgets (id),
+                           tag_id integer references tags (id));
+insert into tags (name) values ('red'), ('blue');
+'''
+
+
+def relate(db):
+    db.widgets.relate('owner', db.users)
+    db.widgets.relate('tags', db.tags, secondary=db.widgets_tags._table)
+
+
+def make_widgets_app(make_app, **options):
+    options.setdefault('column_list', ['name', 'owner', 'tags'])
+    return make_app(SCHEMA, relate=relate, models=['tags', 'widgets'],
+                    view_options=[{}, dict(can_export=True, **options)])
+
+
+def add_widgets(app, count):
+    """ Add `count` widgets, each with both tags and an owner of its
+        own, who is an operator. """
+    with app.app_context():
+        start = app.db.widgets.count()
+        for number in range(start, start + count):
+            owner = app.db.users.insert(
+                email=f'owner{number}@example.com', active=True)
+            app.db.flush()
+            app.db.users_roles.insert(user_id=owner.id, role_id=2)
+            widget = app.db.widgets.insert(name='gadget', owner_id=owner.id)
+            app.db.flush()
+            for tag_id in (1, 2):
+                app.db.widgets_tags.insert(widget_id=widget.id,
+                                           tag_id=tag_id)
+        app.db.commit()
+
+
+def count_queries(app, client, queries, url):
+    """ How many queries loading `url` took, with 2 rows & with 20. """
+    counts = []
+    for rows in (2, 18):
+        add_widgets(app, rows)
+        statements = queries(app)
+        response = client.get(url)
+        assert response.status_code == 200
+        counts.append(len(statements))
+    return counts
+
+
+@pytest.fixture
+def app(make_app):
+    return make_widgets_app(make_app)
+
+
+def test_list_queries_dont_grow_with_the_rows(app, login, queries):
+    client = login(app, 'admin@example.com')
+    first, second = count_queries(app, client, queries, '/admin/widgets/')
+    assert first == second
+
+
+def test_collections_are_selected_in(app, login, queries):
+    client = login(app, 'admin@example.com')
+    add_widgets(app, 2)
+    statements = queries(app)
+    page = client.get('/admin/widgets/').data.decode()
+    assert 'red' in page and 'owner1@example.com' in page
+    tags, = [s for s in statements if 'JOIN widgets_tags' in s]
+    assert 'IN (' in tags
+    # The owner is joined into the list query itself
+    assert any('FROM widgets LEFT OUTER JOIN users' in s for s in statements)
+
+
+def test_loading_can_be_overridden(make_app, login, queries):
+    app = make_widgets_app(
+        make_app, column_relationship_loading=dict(tags='lazy'))
+    client = login(app, 'admin@example.com')
+    first, second = count_queries(app, client, queries, '/admin/widgets/')
+    # One query for each row's tags
+    assert second == first + 18
+
+
+def test_streamed_exports_dont_grow_with_the_rows(app, login, queries):
+    client = login(app, 'admin@example.com')
+    first, second = count_queries(
+        app, client, queries, '/admin/widgets/stream/csv/')
+    assert first == second
+
+
+def test_nested_relationships_are_loaded_together(make_app, login, queries):
+    # Each widget's owner's roles, through the users_roles table
+    app = make_widgets_app(make_app, column_list=['name', 'owner.roles'])
+    client = login(app, 'admin@example.com')
+    first, second = count_queries(app, client, queries, '/admin/widgets/')
+    assert first == second
@@ -0,0 +1,44 @@
+
+import re
+
+import pytest
+
+SCHEMA = 'create table widgets (id integer primary key, name varchar(80));'
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SCHEMA, models=['widgets'], menu_cache_size=16,
+                    view_options=[dict(
+                        roles_accepted=['superuser', 'operator'])])
+
+
+def test_menus_are_cached_per_role_set(app, login):
+    menu_cache = app.blueprints['secure_admin'].menu_cache
+    superuser = login(app, 'admin@example.com')
+    operator = login(app, 'operator@example.com')
+
+    # Only superusers may see the users view
+    assert b'/admin/users/' in superuser.get('/admin/widgets/').data
+    assert b'/admin/users/' not in operator.get('/admin/widgets/').data
+    assert b'/admin/users/' in superuser.get('/admin/widgets/').data
+    assert b'/admin/users/' not in operator.get('/admin/widgets/').data
+    stats = menu_cache.stats()
+    assert stats['misses'] == 2 and stats['hits'] == 2
+
+
+def active_menu_item(page):
+    menu = page.split('navbar-nav">', 1)[1].split('</ul>', 1)[0]
+    return re.search(r'<li class="active">\s*<a href="([^"]+)"',
+                     menu).group(1)
+
+
+def test_menus_are_cached_per_active_view(app, login):
+    menu_cache = app.blueprints['secure_admin'].menu_cache
+    superuser = login(app, 'admin@example.com')
+
+    assert active_menu_item(
+        superuser.get('/admin/widgets/').data.decode()) == '/admin/widgets/'
+    assert active_menu_item(
+        superuser.get('/admin/users/').data.decode()) == '/admin/users/'
+    assert menu_cache.stats()['misses'] == 2
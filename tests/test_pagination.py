@@ -0,0 +1,119 @@
+
+import html, re
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from flask_secure_admin.security.pagination import dump_keyset, load_keyset
+
+# Even rows only match a search for 'w' through their secret,
+# which only superusers can search
+SCHEMA = 'create table widgets (id integer primary key, name varchar(80), ' \
+    'secret text);\n' + ''.join(
+        "insert into widgets (name, secret) values ('{}{}', '{}');\n".format(
+            *(('x', i, 'w') if i % 2 == 0 else ('w', i, '')))
+        for i in range(12))
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SCHEMA, models=['widgets'], view_options=[dict(
+        keyset_pagination=True, page_size=3,
+        column_searchable_list=['name', 'secret'],
+        role_only_columns=dict(superuser=['secret']),
+        roles_accepted=['superuser', 'operator'])])
+
+
+def names(client, page):
+    data = client.get(f'/admin/widgets/?search=w&page={page}').data
+    return re.findall(r'>\s*([wx]\d+)\s*<', data.decode())
+
+
+def test_keyset_pages_are_kept_per_role_set(app, login):
+    superuser = login(app, 'admin@example.com')
+    operator = login(app, 'operator@example.com')
+
+    assert [names(superuser, page) for page in range(3)] == [
+        ['x0', 'w1', 'x2'], ['w3', 'x4', 'w5'], ['x6', 'w7', 'x8']]
+    # The operator's second page mustn't start from where the
+    # superuser's first page ended
+    assert names(operator, 1) == ['w7', 'w9', 'w11']
+    assert names(operator, 0) == ['w1', 'w3', 'w5']
+    assert names(superuser, 1) == ['w3', 'x4', 'w5']
+    assert names(superuser, 2) == ['x6', 'w7', 'x8']
+
+
+def page_names(response):
+    return re.findall(r'>\s*([wx]\d+)\s*<', response.data.decode())
+
+
+def page_link(response, page):
+    for href in re.findall(r'href="([^"]*)"', response.data.decode()):
+        href = html.unescape(href)
+        if f'page={page}&' in href or href.endswith(f'page={page}'):
+            return href
+
+
+def list_queries(statements):
+    return [s for s in statements if 'FROM widgets' in s and 'LIMIT' in s]
+
+
+def seeks(statement):
+    # SQLite always renders LIMIT ? OFFSET ?, so look for
+    # the WHERE clause which starts after the previous page
+    return 'widgets.id > ?' in statement
+
+
+def test_next_page_links_seek_past_the_current_page(app, login, queries):
+    superuser = login(app, 'admin@example.com')
+    response = superuser.get('/admin/widgets/?search=w')
+    assert page_names(response) == ['x0', 'w1', 'x2']
+
+    statements = queries(app)
+    for page, expected in ((1, ['w3', 'x4', 'w5']), (2, ['x6', 'w7', 'x8'])):
+        link = page_link(response, page)
+        assert 'after=' in link
+        response = superuser.get(link)
+        assert page_names(response) == expected
+    assert len(list_queries(statements)) == 2
+    assert all(map(seeks, list_queries(statements)))
+
+
+def test_seek_keys_need_no_earlier_visit(app, login):
+    link = page_link(login(app, 'admin@example.com').get(
+        '/admin/widgets/?search=w'), 1)
+    # Another client (as if on another worker) follows the link
+    response = login(app, 'admin@example.com').get(link)
+    assert page_names(response) == ['w3', 'x4', 'w5']
+
+
+def test_bad_seek_keys_fall_back_to_offset(app, login, queries):
+    superuser = login(app, 'admin@example.com')
+    link = page_link(superuser.get('/admin/widgets/?search=w'), 1)
+    forged = re.sub(r'after=[^&]*', 'after=forged', link)
+    other_search = link.replace('search=w', 'search=x')
+
+    statements = queries(app)
+    assert page_names(superuser.get(forged)) == ['w3', 'x4', 'w5']
+    assert page_names(superuser.get(other_search)) == ['x6', 'x8', 'x10']
+    assert not any(map(seeks, list_queries(statements)))
+
+
+def test_operator_links_are_their_own(app, login):
+    link = page_link(login(app, 'admin@example.com').get(
+        '/admin/widgets/?search=w'), 1)
+    operator = login(app, 'operator@example.com')
+    assert page_names(operator.get(link)) == ['w7', 'w9', 'w11']
+    link = page_link(operator.get('/admin/widgets/?search=w'), 1)
+    assert page_names(operator.get(link)) == ['w7', 'w9', 'w11']
+
+
+@pytest.mark.parametrize('values', [
+    (3,), ('w3', 3), (datetime(2024, 1, 2, 3, 4, 5), 7), (Decimal('1.50'), 2)])
+def test_seek_keys_round_trip(values):
+    token = dump_keyset('secret', 'context', 2, values)
+    assert load_keyset('secret', token, 'context', 2, len(values)) == values
+    assert load_keyset('other', token, 'context', 2, len(values)) is None
+    assert load_keyset('secret', token, 'other', 2, len(values)) is None
+    assert load_keyset('secret', token, 'context', 3, len(values)) is None
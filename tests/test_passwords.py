@@ -0,0 +1,59 @@
+
+import re
+
+import pytest
+from flask_security.utils import verify_password
+
+from flask_secure_admin.passwords import PooledPasswordContext
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(password_hash_rounds=1000, password_hash_workers=2)
+
+
+def stored_password(app, id):
+    with app.app_context():
+        return app.db.users.get(id).password
+
+
+def edit_form(client, id):
+    """ The users edit form's fields, as the browser would send them. """
+    page = client.get(f'/admin/users/edit/?id={id}').data.decode()
+    form = dict(active='y', roles=['2'])
+    for field in re.findall(r'<input [^>]*type="text"[^>]*>', page):
+        name = re.search(r'name="(\w+)"', field).group(1)
+        form[name] = re.search(r'value="([^"]*)"', field).group(1)
+    return form
+
+
+def test_saving_a_user_keeps_their_password_hash(app, login):
+    client = login(app, 'admin@example.com')
+    stored = stored_password(app, 2)
+    form = edit_form(client, 2)
+    assert form['password'] == stored
+
+    form['email'] = 'renamed@example.com'
+    response = client.post('/admin/users/edit/?id=2', data=form)
+    assert response.status_code == 302
+    assert stored_password(app, 2) == stored
+    login(app, 'renamed@example.com')
+
+
+def test_typed_in_passwords_are_hashed(app, login):
+    client = login(app, 'admin@example.com')
+    form = dict(edit_form(client, 2), password='changed')
+    response = client.post('/admin/users/edit/?id=2', data=form)
+    assert response.status_code == 302
+    with app.app_context():
+        assert verify_password('changed', stored_password(app, 2))
+    login(app, 'operator@example.com', 'changed')
+
+
+def test_hashes_are_made_on_the_pool_with_pinned_rounds(app):
+    context = app.extensions['security'].pwd_context
+    assert isinstance(context, PooledPasswordContext)
+    hashed = stored_password(app, 2)
+    assert '$1000$' in hashed
+    with app.app_context():
+        assert verify_password('password', hashed)
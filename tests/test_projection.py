@@ -0,0 +1,68 @@
+
+import pytest
+
+SCHEMA = '''
+create table widgets (id integer primary key, name varchar(80),
+                      secret text, body text);
+insert into widgets (name, secret, body) values ('gadget', 'hush', 'long');
+'''
+
+
+def make_widgets_app(make_app, **options):
+    return make_app(SCHEMA, models=['widgets'], view_options=[dict(
+        column_exclude_list=['body'], can_view_details=True,
+        role_only_columns=dict(superuser=['secret']),
+        roles_accepted=['superuser', 'operator'], **options)])
+
+
+def selected_columns(statements):
+    """ The widgets columns selected by the (one) widgets query. """
+    statement, = [s for s in statements if 'FROM widgets' in s and
+                  'count(' not in s]
+    select = statement.split('FROM widgets')[0]
+    return {column for column in ('id', 'name', 'secret', 'body')
+            if f'widgets.{column}' in select}
+
+
+@pytest.fixture
+def app(make_app):
+    return make_widgets_app(make_app)
+
+
+def test_list_queries_load_only_the_columns_shown(app, login, queries):
+    superuser = login(app, 'admin@example.com')
+    operator = login(app, 'operator@example.com')
+
+    statements = queries(app)
+    superuser.get('/admin/widgets/')
+    assert selected_columns(statements) == {'id', 'name', 'secret'}
+
+    del statements[:]
+    page = operator.get('/admin/widgets/').data
+    assert selected_columns(statements) == {'id', 'name'}
+    assert b'gadget' in page
+
+
+def test_details_queries_load_only_the_columns_shown(app, login, queries):
+    operator = login(app, 'operator@example.com')
+    statements = queries(app)
+    page = operator.get('/admin/widgets/details/?id=1').data
+    assert selected_columns(statements) == {'id', 'name', 'body'}
+    assert b'long' in page and b'hush' not in page
+
+
+def test_projection_can_be_turned_off(make_app, login, queries):
+    app = make_widgets_app(make_app, column_projection=False)
+    operator = login(app, 'operator@example.com')
+    statements = queries(app)
+    operator.get('/admin/widgets/')
+    assert selected_columns(statements) == {'id', 'name', 'secret', 'body'}
+
+
+def test_exports_load_their_columns(make_app, login, queries):
+    app = make_widgets_app(make_app, can_export=True)
+    superuser = login(app, 'admin@example.com')
+    statements = queries(app)
+    data = superuser.get('/admin/widgets/export/csv/').data
+    assert selected_columns(statements) == {'id', 'name', 'secret', 'body'}
+    assert b'long' in data
@@ -0,0 +1,44 @@
+
+import pytest
+
+SCHEMA = '''
+create table widgets (id integer primary key, name varchar(80), secret text);
+insert into widgets (name, secret) values ('gadget', 'hush');
+'''
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SCHEMA, models=['widgets'], view_options=[dict(
+        column_searchable_list=['name', 'secret'],
+        role_only_columns=dict(superuser=['secret']),
+        roles_accepted=['superuser', 'operator'])])
+
+
+def test_role_only_columns_are_kept_per_role_set(app, login):
+    superuser = login(app, 'admin@example.com')
+    operator = login(app, 'operator@example.com')
+
+    # Whoever comes first mustn't decide what the other sees
+    assert b'hush' in superuser.get('/admin/widgets/').data
+    page = operator.get('/admin/widgets/').data
+    assert b'gadget' in page and b'hush' not in page
+    assert b'hush' in superuser.get('/admin/widgets/').data
+
+
+def test_forms_are_kept_per_role_set(app, login):
+    superuser = login(app, 'admin@example.com')
+    operator = login(app, 'operator@example.com')
+
+    assert b'name="secret"' in superuser.get('/admin/widgets/edit/?id=1').data
+    page = operator.get('/admin/widgets/edit/?id=1').data
+    assert b'name="name"' in page and b'name="secret"' not in page
+    assert b'name="secret"' in superuser.get('/admin/widgets/new/').data
+
+
+def test_search_fields_are_kept_per_role_set(app, login):
+    superuser = login(app, 'admin@example.com')
+    operator = login(app, 'operator@example.com')
+
+    assert b'gadget' in superuser.get('/admin/widgets/?search=hush').data
+    assert b'gadget' not in operator.get('/admin/widgets/?search=hush').data
@@ -0,0 +1,63 @@
+
+import logging, os, pickle, sqlite3
+
+import pytest
+from sqlsoup import SQLSoup
+
+from flask_secure_admin.contrib.sqlsoup.schema_snapshot import \
+    load_schema_snapshot
+
+SCHEMA = 'create table widgets (id integer primary key, name varchar(80));'
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / 'test.db'
+    with sqlite3.connect(str(path)) as connection:
+        connection.executescript(SCHEMA)
+    return f'sqlite:///{path}'
+
+
+def test_snapshot_is_used_while_the_schema_is_unchanged(database, tmp_path):
+    path = str(tmp_path / 'schema.pkl')
+    assert not load_schema_snapshot(SQLSoup(database), ['widgets'], path)
+    db = SQLSoup(database)
+    assert load_schema_snapshot(db, ['widgets'], path)
+    assert db.widgets.insert(name='gadget').name == 'gadget'
+
+    with sqlite3.connect(database[len('sqlite:///'):]) as connection:
+        connection.execute('alter table widgets add column body text')
+    assert not load_schema_snapshot(SQLSoup(database), ['widgets'], path)
+
+
+@pytest.mark.parametrize('contents', [b'not a pickle', pickle.dumps([1])])
+def test_unloadable_snapshots_are_replaced(database, tmp_path, contents):
+    path = tmp_path / 'schema.pkl'
+    path.write_bytes(contents)
+    assert not load_schema_snapshot(SQLSoup(database), ['widgets'], str(path))
+    assert load_schema_snapshot(SQLSoup(database), ['widgets'], str(path))
+
+
+def test_unwritable_snapshot_path_is_not_fatal(database, tmp_path, caplog):
+    path = str(tmp_path / 'missing' / 'schema.pkl')
+    db = SQLSoup(database)
+    with caplog.at_level(logging.WARNING):
+        assert not load_schema_snapshot(db, ['widgets'], path)
+    assert 'Could not write the schema snapshot' in caplog.text
+    assert 'name' in db.widgets._table.c
+
+
+def test_failed_writes_leave_no_temporary_file(
+        database, tmp_path, monkeypatch):
+    def dump(*args):
+        raise pickle.PicklingError('nope')
+
+    monkeypatch.setattr(pickle, 'dump', dump)
+    path = tmp_path / 'schema.pkl'
+    assert not load_schema_snapshot(SQLSoup(database), ['widgets'], str(path))
+    assert sorted(os.listdir(tmp_path)) == ['test.db']
+
+
+def test_blueprint_registers_without_a_writable_snapshot(make_app, tmp_path):
+    app = make_app(schema_snapshot_path=str(tmp_path / 'missing' / 'x.pkl'))
+    assert 'schema snapshot' in app.blueprints['secure_admin'].startup_timings
@@ -0,0 +1,26 @@
+
+from flask_admin.contrib.sqla import ModelView
+
+from flask_secure_admin import SecureAdminBlueprint
+
+SCHEMA = '''
+create table widgets (id integer primary key, name varchar(80));
+insert into widgets (name) values ('gadget');
+'''
+
+
+class PlainViewBlueprint(SecureAdminBlueprint):
+
+    def on_after_add_layout_to_admin(self, admin, app, db, options):
+        admin.add_view(ModelView(db.widgets, db.session, endpoint='plain'))
+        return admin
+
+
+def test_plain_model_view_renders_the_list_template(make_app, login):
+    app = make_app(SCHEMA, blueprint_class=PlainViewBlueprint)
+    client = login(app, 'admin@example.com')
+    response = client.get('/admin/plain/')
+    assert response.status_code == 200
+    assert b'gadget' in response.data
+    # Row actions for a plain view don't depend on `is_current_user`
+    assert b'/admin/plain/delete/' in response.data
@@ -0,0 +1,103 @@
+
+from threading import Thread
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from flask_secure_admin.utils import encrypt_password
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(user_cache_size=100, user_cache_ttl=None, config=dict(
+        SECURITY_CHANGEABLE=True, SECURITY_SEND_PASSWORD_CHANGE_EMAIL=False))
+
+
+def load_user(app, email):
+    """ Load `email`'s user through the datastore, as Flask-Security
+        would, and return the cache's stats afterwards. """
+    datastore = app.extensions['security'].datastore
+    with app.test_request_context():
+        assert datastore.find_user(email=email).email == email
+    return datastore.cache.stats()
+
+
+def test_loaded_users_are_cached(app, queries):
+    misses = load_user(app, 'admin@example.com')['misses']
+    statements = queries(app)
+    stats = load_user(app, 'admin@example.com')
+    assert stats['misses'] == misses and stats['hits'] >= 1
+    assert statements == []
+
+
+def test_put_invalidates_the_cached_user(app, login, queries):
+    datastore = app.extensions['security'].datastore
+    load_user(app, 'admin@example.com')
+
+    with app.test_request_context():
+        user = datastore.find_user(email='admin@example.com')
+        user.password = encrypt_password('changed')
+        datastore.put(user)
+        datastore.commit()
+
+    statements = queries(app)
+    misses = datastore.cache.stats()['misses']
+    assert load_user(app, 'admin@example.com')['misses'] == misses + 1
+    assert any('FROM users' in statement for statement in statements)
+
+    response = app.test_client().post('/login', data=dict(
+        email='admin@example.com', password='password'))
+    assert response.status_code == 200
+    login(app, 'admin@example.com', 'changed')
+
+
+def test_changed_password_invalidates_the_cached_user(app, login):
+    client = login(app, 'admin@example.com')
+
+    response = client.post('/change', data=dict(
+        password='password', new_password='changed1',
+        new_password_confirm='changed1'))
+    assert response.status_code == 302
+
+    response = app.test_client().post('/login', data=dict(
+        email='admin@example.com', password='password'))
+    assert response.status_code == 200
+    login(app, 'admin@example.com', 'changed1')
+
+
+def test_other_users_stay_cached(app, queries):
+    datastore = app.extensions['security'].datastore
+    load_user(app, 'admin@example.com')
+    load_user(app, 'operator@example.com')
+
+    with app.test_request_context():
+        datastore.put(datastore.find_user(email='operator@example.com'))
+        datastore.commit()
+
+    statements = queries(app)
+    misses = datastore.cache.stats()['misses']
+    assert load_user(app, 'admin@example.com')['misses'] == misses
+    assert statements == []
+
+
+def test_admin_edits_invalidate_the_cached_user_once_committed(app, login):
+    datastore = app.extensions['security'].datastore
+    superuser = login(app, 'admin@example.com')
+    load_user(app, 'operator@example.com')
+
+    # Another request caches the operator as they were, with their
+    # role, while the edit below is being committed
+    def recache(session):
+        thread = Thread(target=load_user, args=(app, 'operator@example.com'))
+        thread.start()
+        thread.join()
+
+    event.listen(Session, 'before_commit', recache, once=True)
+    response = superuser.post('/admin/users/edit/?id=2', data=dict(
+        email='operator@example.com', active='y', roles=[]))
+    assert response.status_code == 302
+
+    with app.test_request_context():
+        user = datastore.find_user(email='operator@example.com')
+        assert not user.has_role('operator')